@@ -0,0 +1,236 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from dados import PASTA_CACHE
+from registro import carregar_classe, obter, suporta_vetorizado
+
+# -------------------------
+# 💾 Resultados de backtest persistidos em disco
+# -------------------------
+# O cache do Streamlit vive só enquanto o servidor está de pé e a chave dele é o
+# pedido inteiro: incluir um ativo refaz todos os backtests. Aqui cada par
+# (ativos, estratégia) é gravado num SQLite com chave = hash do conteúdo:
+# preços usados (versão dos dados), código da estratégia e dos motores,
+# parâmetros completos e conta (caixa, comissão, sizer), motor e período.
+# Pedidos repetidos ou que se sobrepõem a outros, mesmo dias depois, saem do
+# disco, e só as combinações novas vão para o pool. O registro guarda as
+# métricas em colunas (para consulta) e o resultado inteiro (curva de
+# patrimônio, datas, compras/vendas e operações) serializado.
+
+ARQUIVO_RESULTADOS = os.environ.get("B3_RESULTADOS", os.path.join(PASTA_CACHE, "resultados.sqlite"))
+
+# Partes do resultado que as varreduras (somente_metricas) não trazem de volta
+_CURVAS = ('equity', 'datas', 'compras', 'vendas', 'operacoes')
+_MOTORES = ('execucao.py', 'vetorizado.py', 'nucleos.py', 'cache_indicadores.py')
+
+
+@lru_cache(maxsize=None)
+def versao_motores():
+    pasta = os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.sha1()
+    for nome in _MOTORES:
+        with open(os.path.join(pasta, nome), 'rb') as f:
+            h.update(f.read())
+    # Os analisadores que produzem a curva e as operações também contam
+    import estrategias
+    for classe in (estrategias.Equity, estrategias.Operacoes):
+        h.update(inspect.getsource(classe).encode())
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def versao_estrategia(nome):
+    # Código da classe do backtrader e, se houver, da regra vetorizada
+    h = hashlib.sha1(versao_motores().encode())
+    h.update(inspect.getsource(carregar_classe(nome)).encode())
+    if suporta_vetorizado(nome):
+        from vetorizado import REGRAS
+        h.update(inspect.getsource(REGRAS[nome]).encode())
+    return h.hexdigest()
+
+
+def versao_dados(df):
+    # Hash do conteúdo do quadro: datas, colunas e valores
+    h = hashlib.sha1(json.dumps(list(map(str, df.columns))).encode())
+    h.update(np.ascontiguousarray(df.index.asi8).tobytes())
+    h.update(np.ascontiguousarray(df.to_numpy(dtype='float64')).tobytes())
+    return h.hexdigest()
+
+
+def somente_metricas(resultado):
+    # Sem as curvas: é o que volta das varreduras de parâmetros
+    return {chave: valor for chave, valor in resultado.items() if chave not in _CURVAS}
+
+
+class ArmazemResultados:
+    def __init__(self, arquivo=ARQUIVO_RESULTADOS):
+        self.arquivo = arquivo
+        # Pares (ativos, estratégia) servidos do disco e calculados, desde o início do processo
+        self.acertos = 0
+        self.faltas = 0
+
+    @contextmanager
+    def _conexao(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.arquivo)), exist_ok=True)
+        conexao = sqlite3.connect(self.arquivo, timeout=30)
+        try:
+            # WAL: várias sessões do app leem enquanto uma grava
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute(
+                "CREATE TABLE IF NOT EXISTS resultados ("
+                " chave TEXT PRIMARY KEY, estrategia TEXT, ativos TEXT, params TEXT, motor TEXT,"
+                " inicio TEXT, fim TEXT, sharpe REAL, drawdown REAL, valor_final REAL,"
+                " completo INTEGER, criado TEXT, dados BLOB)"
+            )
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    def descricao(self, precos, job, nome, versoes):
+        # Tudo o que determina o resultado de 'nome' dentro do job; 'versoes'
+        # guarda o hash de cada ativo durante uma chamada
+        definicao = obter(nome)
+        for ticker in job['ativos']:
+            if ticker not in versoes:
+                versoes[ticker] = versao_dados(precos[ticker])
+        motor = 'vetorizado' if (job.get('motor') == 'vetorizado' and len(job['ativos']) == 1
+                                 and definicao.vetorizado) else 'backtrader'
+        return {
+            'ativos': [[ticker, versoes[ticker]] for ticker in job['ativos']],
+            'estrategia': nome,
+            'codigo': versao_estrategia(nome),
+            'params': definicao.parametros(job.get('params')),
+            'caixa': float(job.get('caixa', 10000.0)),
+            'comissao': float(job.get('comissao', 0.0)),
+            'percentual': job.get('percentual'),
+            'motor': motor,
+            'inicio': None if job.get('inicio') is None else str(pd.Timestamp(job['inicio']).date()),
+            'fim': None if job.get('fim') is None else str(pd.Timestamp(job['fim']).date()),
+        }
+
+    @staticmethod
+    def chave(descricao):
+        return hashlib.sha1(json.dumps(descricao, sort_keys=True, default=str).encode()).hexdigest()
+
+    def buscar(self, chaves):
+        # {chave: resultado} das chaves já gravadas
+        encontrados = {}
+        chaves = list(dict.fromkeys(chaves))
+        if not chaves or not os.path.exists(self.arquivo):
+            return encontrados
+        with self._conexao() as conexao:
+            for i in range(0, len(chaves), 500):
+                lote = chaves[i:i + 500]
+                consulta = f"SELECT chave, dados FROM resultados WHERE chave IN ({','.join('?' * len(lote))})"
+                for chave, dados in conexao.execute(consulta, lote):
+                    encontrados[chave] = pickle.loads(dados)
+        return encontrados
+
+    def gravar(self, itens):
+        # itens = [(chave, descricao, resultado)]; um resultado sem as curvas não substitui um completo
+        agora = datetime.now().isoformat(timespec='seconds')
+        linhas = []
+        for chave, descricao, resultado in itens:
+            resultado = {k: v for k, v in resultado.items() if k not in ('desempenho', 'grafico')}
+            linhas.append((
+                chave, descricao['estrategia'], ",".join(ticker for ticker, _ in descricao['ativos']),
+                json.dumps(descricao['params'], default=str), descricao['motor'], descricao['inicio'], descricao['fim'],
+                resultado.get('sharpe'), resultado.get('drawdown'), resultado.get('valor_final'),
+                int('equity' in resultado), agora, pickle.dumps(resultado, protocol=pickle.HIGHEST_PROTOCOL),
+            ))
+        if not linhas:
+            return
+        with self._conexao() as conexao:
+            conexao.executemany(
+                "INSERT INTO resultados VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?) ON CONFLICT(chave) DO UPDATE SET"
+                " sharpe=excluded.sharpe, drawdown=excluded.drawdown, valor_final=excluded.valor_final,"
+                " completo=excluded.completo, criado=excluded.criado, dados=excluded.dados"
+                " WHERE excluded.completo >= resultados.completo",
+                linhas,
+            )
+
+    def separar(self, precos, jobs):
+        # Devolve (resultados, pendentes): resultados[i] já pronto quando todas as
+        # estratégias do job estão gravadas; senão o job entra em 'pendentes' como
+        # (i, job a executar, [(posição, chave, descrição)] que faltam, {posição: resultado servido}),
+        # reduzido às estratégias que faltam
+        versoes = {}
+        resultados = [None] * len(jobs)
+        pendentes, consultados = [], []
+        for i, job in enumerate(jobs):
+            nomes = job['estrategias'] if 'estrategias' in job else [job['estrategia']]
+            try:
+                if job.get('grafico'):
+                    raise ValueError("o gráfico não é gravado")
+                descricoes = [self.descricao(precos, job, nome, versoes) for nome in nomes]
+            except (ValueError, KeyError):
+                # Sem chave (gráfico, estratégia ou parâmetro inválido): o job roda e o erro volta como antes
+                pendentes.append((i, job, [], {}))
+                continue
+            consultados.append((i, job, nomes, [(pos, self.chave(d), d) for pos, d in enumerate(descricoes)]))
+
+        achados = self.buscar(chave for *_, itens in consultados for _, chave, _ in itens)
+        for i, job, nomes, itens in consultados:
+            curvas = not job.get('somente_metricas')
+            servidos = {pos: achados[chave] for pos, chave, _ in itens
+                        if chave in achados and (not curvas or 'equity' in achados[chave])}
+            if not curvas:
+                servidos = {pos: somente_metricas(r) for pos, r in servidos.items()}
+            faltando = [item for item in itens if item[0] not in servidos]
+            self.acertos += len(servidos)
+            self.faltas += len(faltando)
+            if not faltando:
+                resultados[i] = self._montar(job, servidos)
+            elif servidos:
+                pendentes.append((i, dict(job, estrategias=[nomes[pos] for pos, _, _ in faltando]), faltando, servidos))
+            else:
+                pendentes.append((i, job, faltando, servidos))
+        return resultados, pendentes
+
+    @staticmethod
+    def _montar(job, partes):
+        if 'estrategias' in job:
+            return {'estrategias': [partes[pos] for pos in range(len(job['estrategias']))]}
+        return partes[0]
+
+    def juntar(self, job, resultado, faltando, servidos):
+        # Resultado do job original a partir do que voltou do worker e do que saiu
+        # do disco; devolve também os itens novos a gravar
+        if 'erro' in resultado or not faltando:
+            return resultado, []
+        executados = resultado['estrategias'] if 'estrategias' in resultado else [resultado]
+        partes = dict(servidos)
+        partes.update({pos: r for (pos, _, _), r in zip(faltando, executados)})
+        final = self._montar(job, partes)
+        if 'desempenho' in resultado:
+            final['desempenho'] = resultado['desempenho']
+        return final, [(chave, descricao, r) for (_, chave, descricao), r in zip(faltando, executados)]
+
+    def limpar(self):
+        if os.path.exists(self.arquivo):
+            with self._conexao() as conexao:
+                conexao.execute("DELETE FROM resultados")
+            with self._conexao() as conexao:
+                conexao.execute("VACUUM")
+
+    def resumo(self):
+        # Nº de resultados gravados e tamanho do arquivo (MB)
+        if not os.path.exists(self.arquivo):
+            return 0, 0.0
+        with self._conexao() as conexao:
+            total = conexao.execute("SELECT COUNT(*) FROM resultados").fetchone()[0]
+        return total, os.path.getsize(self.arquivo) / 1024 ** 2
+
+
+ARMAZEM_RESULTADOS = ArmazemResultados()
@@ -0,0 +1,279 @@
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import matplotlib
+matplotlib.use('Agg')  # sem janela: os gráficos só são renderizados em PNG
+
+import backtrader as bt
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+import dados
+import estrategias as modulo_estrategias
+from execucao import CerebroFeedsCompartilhados
+from registro import carregar_classe
+from vetorizado import executar_vetorizado
+
+# -------------------------
+# ⏱️ Benchmark das etapas do backtest
+# -------------------------
+# Mede cada etapa do pipeline sobre preços sintéticos (sem rede), para vários
+# tamanhos de série, números de ativos e de estratégias:
+#   download      baixar_yahoo_lote sobre um quadro no formato do yfinance (sem a rede)
+#   normalizacao  normalizar_colunas de cada ativo
+#   cache         gravação e leitura do Parquet local
+#   feed          construção e pré-carga dos bt.feeds.PandasData
+#   cerebro_run   cerebro.run das estratégias, sem analisadores
+#   analisadores  custo adicional de Sharpe, DrawDown e Equity
+#   grafico       plot de cada estratégia em PNG
+#   vetorizado    mesmas estratégias no motor NumPy
+# Cada medida é o menor tempo entre as repetições (as séries de minuto, que
+# levam minutos por caso, são medidas uma vez e sem o gráfico). Os resultados são
+# acrescentados a benchmarks/resultados.jsonl e comparados com benchmarks/base.json.
+#
+#   python benchmark.py                  # todos os casos
+#   python benchmark.py --rapido         # só séries diárias, 1 repetição
+#   python benchmark.py --gravar-base    # grava a medição atual como base
+
+PASTA_BENCH = os.environ.get("B3_BENCH_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+ARQUIVO_RESULTADOS = os.path.join(PASTA_BENCH, "resultados.jsonl")
+ARQUIVO_BASE = os.path.join(PASTA_BENCH, "base.json")
+
+MINUTOS_PREGAO = 420  # 10h às 17h
+TAMANHOS = {
+    '1a_diario': 252,
+    '10a_diario': 2520,
+    '1a_minuto': 252 * MINUTOS_PREGAO,
+}
+ESTRATEGIAS_BENCH = ['StrategySMACross', 'StrategyRSI', 'StrategyMACD', 'StrategyBollinger', 'StrategyIchimoku']
+
+# Uma etapa só é regressão se ficar mais lenta que a base além da tolerância
+# relativa e de um piso absoluto (abaixo dele, é ruído de medição)
+TOLERANCIA = 0.25
+PISO_SEGUNDOS = 0.005
+
+
+def preco_sintetico(semente, tamanho):
+    # Passeio aleatório geométrico reprodutível, no formato do yfinance
+    n = TAMANHOS[tamanho]
+    rng = np.random.default_rng(semente)
+    if tamanho.endswith('minuto'):
+        dias = pd.bdate_range('2024-01-02', periods=n // MINUTOS_PREGAO)
+        minutos = pd.to_timedelta(np.arange(MINUTOS_PREGAO) + 600, unit='min')
+        indice = pd.DatetimeIndex((dias.values[:, None] + minutos.values[None, :]).ravel())
+        escala = 0.001
+    else:
+        indice = pd.bdate_range('2015-01-02', periods=n)
+        escala = 0.02
+
+    fechamento = 20 * np.exp(np.cumsum(rng.normal(0.0003 * escala / 0.02, escala, n)))
+    abertura = fechamento * (1 + rng.normal(0, escala / 4, n))
+    maxima = np.maximum(abertura, fechamento) * (1 + np.abs(rng.normal(0, escala / 2, n)))
+    minima = np.minimum(abertura, fechamento) * (1 - np.abs(rng.normal(0, escala / 2, n)))
+    return pd.DataFrame({
+        'Open': abertura, 'High': maxima, 'Low': minima, 'Close': fechamento,
+        'Adj Close': fechamento, 'Volume': rng.integers(100_000, 10_000_000, n).astype('float64'),
+    }, index=pd.Index(indice, name='Date'))
+
+
+@contextmanager
+def _yahoo_sintetico(bruto):
+    # Entrega o quadro sintético no lugar do yf.download, só durante a medição
+    original = dados.yf.download
+    dados.yf.download = lambda *args, **kwargs: bruto
+    try:
+        yield
+    finally:
+        dados.yf.download = original
+
+
+@contextmanager
+def _cache_temporario():
+    original = dados.PASTA_CACHE
+    with tempfile.TemporaryDirectory() as pasta:
+        dados.PASTA_CACHE = pasta
+        try:
+            yield
+        finally:
+            dados.PASTA_CACHE = original
+
+
+def cronometrar(funcao, repeticoes):
+    melhor, resultado = float('inf'), None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def _feeds(quadros, minuto):
+    extra = {'timeframe': bt.TimeFrame.Minutes} if minuto else {}
+    return [bt.feeds.PandasData(dataname=df, name=ticker, **extra) for ticker, df in quadros.items()]
+
+
+def _preparar_feeds(quadros, minuto):
+    # O mesmo que o Cerebro faz com cada feed antes da primeira passada
+    cerebro = bt.Cerebro()
+    feeds = _feeds(quadros, minuto)
+    for feed in feeds:
+        cerebro.adddata(feed)
+        feed.reset()
+        feed._start()
+        feed.preload()
+    return feeds
+
+
+def _cerebro(quadros, nomes, minuto, analisadores):
+    cerebro = CerebroFeedsCompartilhados()
+    cerebro.broker.setcash(100000.0)
+    cerebro.broker.setcommission(commission=0.001)
+    cerebro.addsizer(bt.sizers.PercentSizer, percents=95)
+    for feed in _feeds(quadros, minuto):
+        cerebro.adddata(feed)
+    cerebro.adicionar_estrategias([(carregar_classe(nome), None) for nome in nomes])
+    if analisadores:
+        cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe')
+        cerebro.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
+        cerebro.addanalyzer(modulo_estrategias.Equity, _name='equity')
+    return cerebro.run()
+
+
+def _graficos(execucoes):
+    from backtrader import plot as plot_bt  # como no Cerebro.plot: só depois do pyplot
+    for i, (estrategia,) in enumerate(execucoes):
+        fig = plot_bt.Plot(style='candlestick').plot(estrategia, figid=i, iplot=False)[0]
+        fig.savefig(io.BytesIO(), format='png')
+        plt.close(fig)
+
+
+def medir_caso(tamanho, n_ativos, n_estrategias, repeticoes=3, grafico=True):
+    tickers = [f"SINT{i:02d}3.SA" for i in range(n_ativos)]
+    nomes = ESTRATEGIAS_BENCH[:n_estrategias]
+    minuto = tamanho.endswith('minuto')
+    if minuto:
+        repeticoes, grafico = 1, False
+    fixtures = {ticker: preco_sintetico(i, tamanho) for i, ticker in enumerate(tickers)}
+    bruto = pd.concat(fixtures, axis=1, names=['Ticker', 'Price'])
+    inicio, fim = bruto.index[0], bruto.index[-1] + pd.Timedelta(days=1)
+
+    tempos = {}
+    with _yahoo_sintetico(bruto):
+        tempos['download'], quadros = cronometrar(lambda: dados.baixar_yahoo_lote(tickers, inicio, fim), repeticoes)
+    tempos['normalizacao'], _ = cronometrar(lambda: [dados.normalizar_colunas(bruto, t) for t in tickers], repeticoes)
+
+    def gravar_e_ler():
+        for ticker, df in quadros.items():
+            dados.salvar_cache(ticker, df, inicio, fim)
+        return {ticker: dados.ler_cache(ticker) for ticker in tickers}
+    with _cache_temporario():
+        tempos['cache'], _ = cronometrar(gravar_e_ler, repeticoes)
+
+    tempos['feed'], _ = cronometrar(lambda: _preparar_feeds(quadros, minuto), repeticoes)
+    tempos['cerebro_run'], _ = cronometrar(lambda: _cerebro(quadros, nomes, minuto, False), repeticoes)
+    com_analisadores, execucoes = cronometrar(lambda: _cerebro(quadros, nomes, minuto, True), repeticoes)
+    tempos['analisadores'] = max(0.0, com_analisadores - tempos['cerebro_run'])
+    if grafico:
+        tempos['grafico'], _ = cronometrar(lambda: _graficos(execucoes), 1)
+    tempos['vetorizado'], _ = cronometrar(
+        lambda: [executar_vetorizado(df, nome, caixa=100000.0, comissao=0.001, percentual=95)
+                 for df in quadros.values() for nome in nomes],
+        repeticoes)
+    return tempos
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def comparar(atual, base, tolerancia=TOLERANCIA):
+    linhas = []
+    for chave, segundos in atual.items():
+        anterior = base.get(chave)
+        regressao = (anterior is not None and segundos > anterior * (1 + tolerancia)
+                     and segundos - anterior > PISO_SEGUNDOS)
+        linhas.append({
+            'caso': chave.rsplit('/', 1)[0],
+            'etapa': chave.rsplit('/', 1)[1],
+            'segundos': round(segundos, 4),
+            'base': None if anterior is None else round(anterior, 4),
+            'razao': None if not anterior else round(segundos / anterior, 2),
+            'regressao': regressao,
+        })
+    return pd.DataFrame(linhas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das etapas do backtest com preços sintéticos")
+    parser.add_argument('--tamanhos', nargs='+', choices=list(TAMANHOS), default=list(TAMANHOS))
+    parser.add_argument('--ativos', nargs='+', type=int, default=[1, 3])
+    parser.add_argument('--estrategias', nargs='+', type=int, default=[1, len(ESTRATEGIAS_BENCH)])
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--sem-grafico', action='store_true', help="não mede o plot")
+    parser.add_argument('--rapido', action='store_true', help="só séries diárias e uma repetição")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA)
+    parser.add_argument('--gravar-base', action='store_true', help="grava esta medição como base de comparação")
+    args = parser.parse_args()
+
+    if args.rapido:
+        args.tamanhos = [t for t in args.tamanhos if not t.endswith('minuto')]
+        args.repeticoes = 1
+
+    atual = {}
+    for tamanho in args.tamanhos:
+        for n_ativos in args.ativos:
+            for n_estrategias in args.estrategias:
+                caso = f"{tamanho}/{n_ativos}ativos/{n_estrategias}estrategias"
+                print(f"▶ {caso}", flush=True)
+                tempos = medir_caso(tamanho, n_ativos, n_estrategias, args.repeticoes, grafico=not args.sem_grafico)
+                atual.update({f"{caso}/{etapa}": segundos for etapa, segundos in tempos.items()})
+
+    os.makedirs(PASTA_BENCH, exist_ok=True)
+    registro = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit(),
+        'maquina': {'python': platform.python_version(), 'sistema': platform.platform(), 'cpus': os.cpu_count()},
+        'repeticoes': args.repeticoes,
+        'tempos': atual,
+    }
+    with open(ARQUIVO_RESULTADOS, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(registro) + "\n")
+
+    base = {}
+    if os.path.exists(ARQUIVO_BASE):
+        with open(ARQUIVO_BASE, encoding='utf-8') as f:
+            base = json.load(f)['tempos']
+
+    tabela = comparar(atual, base, args.tolerancia)
+    with pd.option_context('display.max_rows', None, 'display.width', 160):
+        print(tabela.to_string(index=False))
+
+    if args.gravar_base:
+        with open(ARQUIVO_BASE, 'w', encoding='utf-8') as f:
+            json.dump(registro, f, indent=2)
+        print(f"Base gravada em {ARQUIVO_BASE}")
+        return 0
+
+    regressoes = tabela[tabela['regressao']]
+    if not regressoes.empty:
+        print(f"\n⚠️ {len(regressoes)} etapa(s) mais lenta(s) que a base (tolerância {args.tolerancia:.0%}):")
+        print(regressoes[['caso', 'etapa', 'segundos', 'base', 'razao']].to_string(index=False))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
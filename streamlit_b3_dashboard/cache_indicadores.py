@@ -0,0 +1,73 @@
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+# -------------------------
+# 🧮 Cache de indicadores compartilhado entre estratégias
+# -------------------------
+# Guarda séries de indicadores já calculadas, com chave
+# (ticker, início, fim, nº de pregões) + nome do indicador + parâmetros, para que
+# RSI(14), SMA(14), MACD etc. sejam calculados uma única vez por ativo quando
+# várias estratégias (ou várias combinações de parâmetros) usam o mesmo
+# indicador. O tamanho é limitado em bytes, descartando o uso mais antigo (LRU).
+
+LIMITE_MB = float(os.environ.get("B3_CACHE_INDICADORES_MB", "256"))
+
+
+def _tamanho(valor):
+    if isinstance(valor, tuple):
+        return sum(_tamanho(v) for v in valor)
+    return valor.nbytes if isinstance(valor, np.ndarray) else 0
+
+
+def _somente_leitura(valor):
+    # As séries são compartilhadas: quem recebe não pode alterá-las no lugar
+    if isinstance(valor, tuple):
+        return tuple(_somente_leitura(v) for v in valor)
+    if isinstance(valor, np.ndarray):
+        valor.setflags(write=False)
+    return valor
+
+
+class CacheIndicadores:
+    def __init__(self, limite_bytes=LIMITE_MB * 1024 ** 2):
+        self.limite_bytes = limite_bytes
+        self._itens = OrderedDict()
+        self._bytes = 0
+        self.acertos = 0
+        self.faltas = 0
+
+    def obter(self, chave, calcular):
+        if chave in self._itens:
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return self._itens[chave]
+
+        self.faltas += 1
+        valor = _somente_leitura(calcular())
+        self._itens[chave] = valor
+        self._bytes += _tamanho(valor)
+
+        while self._bytes > self.limite_bytes and len(self._itens) > 1:
+            _, antigo = self._itens.popitem(last=False)
+            self._bytes -= _tamanho(antigo)
+        return valor
+
+    def limpar(self):
+        self._itens.clear()
+        self._bytes = 0
+        self.acertos = 0
+        self.faltas = 0
+
+    def resumo(self):
+        return {
+            'itens': len(self._itens),
+            'MB': round(self._bytes / 1024 ** 2, 2),
+            'acertos': self.acertos,
+            'faltas': self.faltas,
+        }
+
+
+# Um cache por processo: cada worker do pool mantém o seu
+CACHE_INDICADORES = CacheIndicadores()
@@ -0,0 +1,400 @@
+import json
+import os
+from datetime import date
+
+import pandas as pd
+import yfinance as yf
+
+# -------------------------
+# 💾 Armazenamento local de preços (OHLCV)
+# -------------------------
+# Cada ativo fica em um arquivo Parquet próprio ({ticker}.parquet) dentro da
+# pasta de cache. O arquivo indice.json guarda, por ativo, o intervalo de datas
+# já consultado na fonte de dados, para sabermos se um pedido pode ser atendido
+# só com o que está em disco (inclusive sem internet).
+
+# De onde vêm os pregões que faltam no cache: "yahoo" (yf.download) ou
+# "arquivos" (uma pasta de replay com {ativo}.csv / {ativo}.parquet)
+FONTE = os.environ.get("B3_FONTE", "yahoo")
+PASTA_REPLAY = os.environ.get(
+    "B3_PASTA_REPLAY",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "replay"),
+)
+
+# Cada fonte tem o seu cache, para os preços de uma não cobrirem os da outra
+PASTA_CACHE = os.environ.get(
+    "B3_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache_precos" if FONTE == "yahoo" else f"cache_precos_{FONTE}"),
+)
+MODO_OFFLINE = os.environ.get("B3_OFFLINE", "0") == "1"
+# Depois de um pedido que falhou, o ativo espera este tempo antes de ser pedido de novo
+ESPERA_FALHA = pd.Timedelta(minutes=float(os.environ.get("B3_ESPERA_FALHA_MIN", "60")))
+
+COLUNAS_OHLCV = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+
+# Ativos atendidos só com o que está em disco (acertos) e os que precisaram da fonte de dados (faltas)
+ESTATISTICAS_CACHE = {'acertos': 0, 'faltas': 0}
+
+
+def quadro_vazio():
+    return pd.DataFrame(columns=COLUNAS_OHLCV, index=pd.DatetimeIndex([], name='Date'), dtype='float64')
+
+
+def caminho_cache(ticker):
+    return os.path.join(PASTA_CACHE, f"{ticker}.parquet")
+
+
+def _caminho_indice():
+    return os.path.join(PASTA_CACHE, "indice.json")
+
+
+def ler_indice():
+    try:
+        with open(_caminho_indice(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _salvar_indice(indice):
+    os.makedirs(PASTA_CACHE, exist_ok=True)
+    tmp = _caminho_indice() + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(indice, f, indent=2, sort_keys=True)
+    os.replace(tmp, _caminho_indice())
+
+
+def normalizar_colunas(df, ticker=None):
+    # O yfinance devolve colunas MultiIndex (Price, Ticker) mesmo para um único ativo
+    if isinstance(df.columns, pd.MultiIndex):
+        nivel = 'Ticker' if 'Ticker' in df.columns.names else df.columns.nlevels - 1
+        if ticker is not None and ticker in df.columns.get_level_values(nivel):
+            df = df.xs(ticker, axis=1, level=nivel)
+        else:
+            df = df.droplevel(nivel, axis=1)
+
+    df = df.copy()
+    df.columns = [str(col).strip() for col in df.columns]
+    df = df[[col for col in COLUNAS_OHLCV if col in df.columns]]
+    df = df.dropna(how='all')
+
+    indice = pd.to_datetime(df.index)
+    if indice.tz is not None:
+        indice = indice.tz_localize(None)
+    df.index = indice
+    df.index.name = 'Date'
+    return df.astype('float64').sort_index()
+
+
+def _pedido_falhou(erro):
+    # O yfinance registra um erro por ativo. "no price data found" vem de uma
+    # resposta válida sem pregões no intervalo (antes da listagem, depois do
+    # cancelamento): não é falha. Os demais (rede, limite de pedidos, fuso não
+    # encontrado, que também aparece quando a rede cai) são.
+    return erro is not None and "no price data found" not in str(erro)
+
+
+def baixar_yahoo_lote(tickers, inicio, fim):
+    # Um único pedido ao Yahoo para todo o universo. Com group_by='ticker' o
+    # resultado vem em MultiIndex (Ticker, Price), que é separado aqui em um
+    # DataFrame por ativo; datas em que o ativo não negociou viram NaN e são descartadas.
+    tickers = list(tickers)
+    df = yf.download(tickers, start=inicio, end=fim, group_by='ticker', progress=False)
+    erros = dict(getattr(yf.shared, '_ERRORS', {}))
+    quadros = {}
+    for ticker in tickers:
+        if _pedido_falhou(erros.get(ticker.upper())) or df is None:
+            quadros[ticker] = None
+        elif df.empty or ticker not in df.columns.get_level_values('Ticker'):
+            quadros[ticker] = quadro_vazio()
+        else:
+            quadros[ticker] = normalizar_colunas(df, ticker)
+    return quadros
+
+
+def baixar_yahoo(ticker, inicio, fim):
+    df = baixar_yahoo_lote([ticker], inicio, fim)[ticker]
+    return quadro_vazio() if df is None else df
+
+
+# -------------------------
+# 🔌 Fontes de dados
+# -------------------------
+# Toda fonte responde a baixar_lote(tickers, inicio, fim) com {ticker: OHLCV
+# normalizado de [inicio, fim)}, vazio quando não há dados e None quando o
+# pedido do ativo falhou. O cache local fica na frente de qualquer uma delas.
+# Uma fonte cujos dados mudam no lugar (arquivos) tem também versao(ticker):
+# quando ela muda, o que está no cache do ativo é descartado e buscado de novo.
+
+class FonteYahoo:
+    nome = "yahoo"
+
+    def baixar_lote(self, tickers, inicio, fim):
+        return baixar_yahoo_lote(tickers, inicio, fim)
+
+
+class FonteArquivos:
+    # Replay de uma pasta local: sem rede e sempre com os mesmos preços, para
+    # testes, demonstrações e máquinas isoladas. Aceita o CSV gravado pelo
+    # streamlit_app_v2.py (df.to_csv do yf.download) e Parquet.
+    nome = "arquivos"
+
+    def __init__(self, pasta=None):
+        self.pasta = pasta or PASTA_REPLAY
+
+    def caminho(self, ticker):
+        # PETR4.SA.parquet, PETR4.SA.csv ou, sem o sufixo, PETR4.csv
+        for nome in dict.fromkeys((ticker, ticker.removesuffix(".SA"))):
+            for extensao in (".parquet", ".csv"):
+                caminho = os.path.join(self.pasta, nome + extensao)
+                if os.path.exists(caminho):
+                    return caminho
+        return None
+
+    def ler(self, ticker):
+        caminho = self.caminho(ticker)
+        if caminho is None:
+            return quadro_vazio()
+        if caminho.endswith(".parquet"):
+            return normalizar_colunas(pd.read_parquet(caminho), ticker)
+        with open(caminho) as f:
+            cabecalho = [f.readline() for _ in range(3)]
+        # O yfinance recente grava linhas extras no cabeçalho: "Ticker,PETR4.SA,..." e "Date,,,,"
+        linhas_extras = [i for i in (1, 2) if cabecalho[i].startswith("Ticker,") or cabecalho[i].rstrip().endswith(",,")]
+        df = pd.read_csv(caminho, index_col=0, skiprows=linhas_extras)
+        df.index = pd.to_datetime(df.index)
+        return normalizar_colunas(df, ticker)
+
+    def versao(self, ticker):
+        # Data de modificação e tamanho do arquivo (None se ele não existe): o
+        # cache do ativo só vale para a versão do arquivo que o gerou
+        caminho = self.caminho(ticker)
+        if caminho is None:
+            return None
+        info = os.stat(caminho)
+        return f"{os.path.basename(caminho)}:{info.st_mtime_ns}:{info.st_size}"
+
+    def baixar_lote(self, tickers, inicio, fim):
+        inicio, fim = pd.Timestamp(inicio), pd.Timestamp(fim)
+        quadros = {}
+        for ticker in tickers:
+            df = self.ler(ticker)
+            quadros[ticker] = df.loc[(df.index >= inicio) & (df.index < fim)]
+        return quadros
+
+
+FONTES = {
+    FonteYahoo.nome: FonteYahoo,
+    FonteArquivos.nome: FonteArquivos,
+}
+
+
+def fonte_configurada(nome=None):
+    nome = nome or FONTE
+    if nome not in FONTES:
+        raise ValueError(f"Fonte de dados desconhecida: {nome} (disponíveis: {', '.join(FONTES)})")
+    return FONTES[nome]()
+
+
+def ler_cache(ticker):
+    caminho = caminho_cache(ticker)
+    if not os.path.exists(caminho):
+        return quadro_vazio()
+    return pd.read_parquet(caminho)
+
+
+def salvar_cache(ticker, df, inicio, fim, versao=None):
+    os.makedirs(PASTA_CACHE, exist_ok=True)
+    tmp = caminho_cache(ticker) + ".tmp"
+    df.to_parquet(tmp)
+    os.replace(tmp, caminho_cache(ticker))
+
+    indice = ler_indice()
+    indice[ticker] = {
+        "inicio": str(pd.Timestamp(inicio).date()),
+        "fim": str(pd.Timestamp(fim).date()),
+        "ultimo_pregao": str(df.index.max().date()) if not df.empty else None,
+    }
+    if versao is not None:
+        indice[ticker]["versao"] = versao
+    _salvar_indice(indice)
+
+
+def _mesclar(df, novo):
+    if df.empty:
+        return novo
+    if novo.empty:
+        return df
+    df = pd.concat([df, novo])
+    # Em caso de sobreposição vale a barra mais recente baixada
+    return df[~df.index.duplicated(keep='last')].sort_index()
+
+
+def _em_espera(coberto, agora):
+    falha = (coberto or {}).get("falha")
+    return falha is not None and agora - pd.Timestamp(falha) < ESPERA_FALHA
+
+
+def _registrar_falhas(tickers, agora):
+    indice = ler_indice()
+    for ticker in tickers:
+        indice.setdefault(ticker, {})["falha"] = agora.isoformat(timespec='seconds')
+    _salvar_indice(indice)
+
+
+def _trechos_faltantes(coberto, inicio, fim):
+    # Trechos de [inicio, fim) que ainda não estão em disco, rotulados pelo tipo.
+    # Sem inicio, mantém o começo já salvo (ou cinco anos para ativos novos).
+    if not coberto or "inicio" not in coberto:
+        return [("novo", fim - pd.DateOffset(years=5) if inicio is None else inicio, fim)]
+
+    trechos = []
+    c_inicio, c_fim = pd.Timestamp(coberto["inicio"]), pd.Timestamp(coberto["fim"])
+    if inicio is not None and inicio < c_inicio:
+        trechos.append(("anterior", inicio, c_inicio))
+    if fim > c_fim:
+        # Rebaixa a partir do último pregão salvo: ele pode ter sido gravado com o
+        # dia ainda em aberto. Um último pregão antigo (ativo cancelado) não conta,
+        # ou o pedido do lote inteiro voltaria até ele
+        ultimo = pd.Timestamp(coberto["ultimo_pregao"]) if coberto.get("ultimo_pregao") else c_fim
+        trechos.append(("posterior", ultimo if c_fim - pd.Timedelta(days=7) <= ultimo < c_fim else c_fim, fim))
+    return trechos
+
+
+def completar_cache_lote(tickers, inicio, fim, fonte=None, forcar=False):
+    # Busca na fonte de dados (Yahoo, por padrão) apenas os trechos de
+    # [inicio, fim) que ainda não estão em disco e os mescla ao arquivo de cada
+    # ativo. Trechos do mesmo tipo são baixados juntos, em um único pedido
+    # cobrindo a união dos intervalos, de modo que um universo inteiro costuma
+    # custar uma só chamada. Um trecho que volta vazio com sucesso (ativo ainda
+    # não listado ou já cancelado) conta como coberto e não é pedido de novo. Se
+    # o pedido do ativo falhar, o intervalo coberto não muda e o ativo só volta a
+    # ser pedido depois de ESPERA_FALHA (ou com 'forcar'). Com uma fonte
+    # versionada, o cache de um ativo cujo arquivo apareceu ou mudou é refeito.
+    inicio = None if inicio is None else pd.Timestamp(inicio)
+    fim = pd.Timestamp(fim)
+    indice = ler_indice()
+    fonte = fonte or fonte_configurada()
+    agora = pd.Timestamp.now()
+
+    cobertos, versoes, inicios = {}, {}, {}
+    for ticker in tickers:
+        coberto = indice.get(ticker) if "inicio" in indice.get(ticker, {}) else None
+        inicios[ticker] = inicio
+        if hasattr(fonte, 'versao'):
+            versoes[ticker] = fonte.versao(ticker)
+            if coberto and coberto.get("versao") != versoes[ticker]:
+                # Refeito desde o começo já pedido antes, não só a partir de 'inicio'
+                anterior = pd.Timestamp(coberto["inicio"])
+                inicios[ticker] = anterior if inicio is None else min(inicio, anterior)
+                coberto = None
+        cobertos[ticker] = coberto
+
+    grupos = {}
+    for ticker in tickers:
+        if not forcar and _em_espera(indice.get(ticker), agora):
+            continue
+        for tipo, t_inicio, t_fim in _trechos_faltantes(cobertos[ticker], inicios[ticker], fim):
+            grupos.setdefault(tipo, []).append((ticker, t_inicio, t_fim))
+
+    baixados = {ticker: [] for ticker in tickers}
+    for trechos in grupos.values():
+        lote = fonte.baixar_lote(
+            [ticker for ticker, _, _ in trechos],
+            min(t_inicio for _, t_inicio, _ in trechos),
+            max(t_fim for _, _, t_fim in trechos),
+        )
+        for ticker, t_inicio, t_fim in trechos:
+            baixados[ticker].append((t_inicio, t_fim, lote[ticker]))
+
+    for ticker in tickers:
+        ESTATISTICAS_CACHE['faltas' if baixados[ticker] else 'acertos'] += 1
+
+    quadros, falhas = {}, []
+    for ticker in tickers:
+        coberto = cobertos[ticker]
+        df = ler_cache(ticker) if coberto else quadro_vazio()
+        novo_inicio = pd.Timestamp(coberto["inicio"]) if coberto else None
+        novo_fim = pd.Timestamp(coberto["fim"]) if coberto else None
+
+        alterado = False
+        for t_inicio, t_fim, novo in baixados[ticker]:
+            if novo is None:
+                falhas.append(ticker)
+                continue
+            df = _mesclar(df, novo)
+            novo_inicio = t_inicio if novo_inicio is None else min(novo_inicio, t_inicio)
+            novo_fim = t_fim if novo_fim is None else max(novo_fim, t_fim)
+            alterado = True
+
+        if alterado:
+            salvar_cache(ticker, df, novo_inicio, novo_fim, versao=versoes.get(ticker))
+        quadros[ticker] = df
+    if falhas:
+        _registrar_falhas(dict.fromkeys(falhas), agora)
+    return quadros
+
+
+def completar_cache(ticker, inicio, fim):
+    return completar_cache_lote([ticker], inicio, fim)[ticker]
+
+
+def inicio_com_aquecimento(inicio, aquecimento):
+    # Data a partir da qual buscar para ter 'aquecimento' pregões antes de
+    # 'inicio'; a folga cobre os feriados da B3 (uns dez por ano)
+    inicio = pd.Timestamp(inicio)
+    if not aquecimento:
+        return inicio
+    return inicio - pd.offsets.BDay(int(aquecimento * 1.1) + 5)
+
+
+def _recortar(df, inicio, fim, aquecimento):
+    # [inicio, fim) mais exatamente 'aquecimento' pregões anteriores (ou os que existirem)
+    antes = int(df.index.searchsorted(inicio))
+    depois = int(df.index.searchsorted(fim))
+    return df.iloc[max(antes - aquecimento, 0):depois]
+
+
+def carregar_universo(tickers, inicio, fim, offline=None, aquecimento=0):
+    # Devolve {ticker: OHLCV de [inicio, fim)} lendo do cache; o que faltar de
+    # todos os ativos é buscado na fonte de dados em lote. Com 'aquecimento', cada quadro
+    # começa esse número de pregões antes de 'inicio', para os indicadores das
+    # estratégias já estarem prontos no primeiro pregão do período.
+    offline = MODO_OFFLINE if offline is None else offline
+    inicio, fim = pd.Timestamp(inicio), pd.Timestamp(fim)
+
+    if offline:
+        quadros = {ticker: ler_cache(ticker) for ticker in tickers}
+        for df in quadros.values():
+            ESTATISTICAS_CACHE['faltas' if df.empty else 'acertos'] += 1
+    else:
+        quadros = completar_cache_lote(tickers, inicio_com_aquecimento(inicio, aquecimento), fim)
+
+    return {ticker: _recortar(df, inicio, fim, aquecimento) for ticker, df in quadros.items()}
+
+
+def carregar_precos(ticker, inicio, fim, offline=None, aquecimento=0):
+    return carregar_universo([ticker], inicio, fim, offline=offline, aquecimento=aquecimento)[ticker]
+
+
+def atualizar_cache(tickers=None, fim=None):
+    # Atualização diária: estende cada ativo já salvo até hoje (inclusive),
+    # baixando só as barras novas. Sem lista, atualiza todo o cache.
+    indice = ler_indice()
+    tickers = sorted(indice) if tickers is None else tickers
+    fim = pd.Timestamp(date.today()) + pd.Timedelta(days=1) if fim is None else pd.Timestamp(fim)
+
+    # Pedido explícito: os ativos em espera por falha recente também são tentados
+    quadros = completar_cache_lote(tickers, None, fim, forcar=True)
+
+    resumo = []
+    for ticker in tickers:
+        df = quadros[ticker]
+        antes = indice.get(ticker, {}).get("ultimo_pregao")
+        barras_novas = len(df) if antes is None else int((df.index > pd.Timestamp(antes)).sum())
+        resumo.append({
+            "Ativo": ticker,
+            "Último pregão": df.index.max().date() if not df.empty else None,
+            "Barras novas": barras_novas,
+        })
+    return pd.DataFrame(resumo)
@@ -0,0 +1,134 @@
+import cProfile
+import io
+import marshal
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# -------------------------
+# ⏱️ Medição de desempenho por etapa
+# -------------------------
+# Cada etapa registra tempo de parede, tempo de CPU, pico de memória residente
+# durante a própria etapa e, quando há um cache envolvido, quantos acertos e
+# faltas ocorreram durante ela. Nos workers do pool, as etapas voltam junto com
+# o resultado do job (chave 'desempenho') para serem exibidas no painel do app.
+
+
+def pico_memoria_mb():
+    # Maior memória residente do processo desde o último zerar_pico_memoria()
+    # (VmHWM no Linux) ou, sem ele, desde o início (ru_maxrss vem em KB no
+    # Linux e em bytes no macOS); indisponível no Windows
+    try:
+        with open('/proc/self/status') as f:
+            for linha in f:
+                if linha.startswith('VmHWM:'):
+                    return round(int(linha.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(pico / (1024 ** 2 if sys.platform == 'darwin' else 1024), 1)
+
+
+def zerar_pico_memoria():
+    # Linux: escrever 5 em clear_refs reinicia o VmHWM na memória residente atual.
+    # Devolve False onde não há como zerar (o pico passa a ser o do processo)
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+# Etapas em andamento no processo, de qualquer Medidor (o do app, o do worker
+# que roda no próprio processo, o do perfil), com o maior pico de cada uma antes
+# do último zerar: o VmHWM é do processo, e cada zerar apagaria o pico delas
+_ABERTAS = []
+
+
+class Medidor:
+    def __init__(self, origem='app'):
+        self.origem = origem
+        self.etapas = []
+
+    @contextmanager
+    def etapa(self, nome, cache=None):
+        # 'cache' é uma função que devolve (acertos, faltas) acumulados, lida antes e depois da etapa
+        registro = {'Etapa': nome, 'Onde': self.origem}
+        antes = cache() if cache else None
+        # O pico é zerado no início da etapa; as etapas de fora guardam o que já tinham alcançado
+        pico_antes = pico_memoria_mb()
+        for aberta in _ABERTAS:
+            aberta[1] = max(aberta[1], pico_antes or 0.0)
+        zerado = zerar_pico_memoria()
+        aberta = [registro, 0.0]
+        _ABERTAS.append(aberta)
+        parede, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield registro
+        finally:
+            registro['Parede (s)'] = round(time.perf_counter() - parede, 4)
+            registro['CPU (s)'] = round(time.process_time() - cpu, 4)
+            # Por identidade: etapas de mesmo nome em sessões diferentes são iguais na comparação
+            del _ABERTAS[next(i for i, outra in enumerate(_ABERTAS) if outra is aberta)]
+            pico = pico_memoria_mb()
+            if zerado:
+                registro['Pico na etapa (MB)'] = max(aberta[1], pico)
+            else:
+                # Só o pico do processo: ele é o da etapa apenas se subiu durante ela
+                registro['Pico na etapa (MB)'] = pico if pico is not None and pico > (pico_antes or 0.0) else None
+            if cache:
+                depois = cache()
+                registro['Cache (acertos)'] = depois[0] - antes[0]
+                registro['Cache (faltas)'] = depois[1] - antes[1]
+            self.etapas.append(registro)
+
+    def incorporar(self, etapas, prefixo=None, origem=None):
+        # Etapas medidas em outro processo (ou numa execução memorizada)
+        for registro in etapas or []:
+            registro = dict(registro)
+            if prefixo:
+                registro['Etapa'] = f"{prefixo} · {registro['Etapa']}"
+            if origem:
+                registro['Onde'] = origem
+            self.etapas.append(registro)
+
+
+class _SemMedicao:
+    # Mesmo formato do Medidor, sem custo: usado quando a medição está desligada
+    etapas = []
+
+    @contextmanager
+    def etapa(self, nome, cache=None):
+        yield {}
+
+    def incorporar(self, etapas, prefixo=None, origem=None):
+        pass
+
+
+SEM_MEDICAO = _SemMedicao()
+
+
+def iniciar_perfil():
+    # cProfile de um trecho que pode atravessar várias seções do script
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def encerrar_perfil(profiler, linhas=40):
+    # Relatório em texto (ordenado pelo tempo acumulado) e o dump binário, no
+    # mesmo formato de Profile.dump_stats(), para abrir no snakeviz/pstats
+    profiler.disable()
+    texto = io.StringIO()
+    pstats.Stats(profiler, stream=texto).sort_stats('cumulative').print_stats(linhas)
+    profiler.create_stats()
+    return {'relatorio': texto.getvalue(), 'dump': marshal.dumps(profiler.stats)}
@@ -0,0 +1,249 @@
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+# -------------------------
+# 🧠 Estratégias e analisadores do backtest
+# -------------------------
+# Ficam fora do script do Streamlit para poderem ser importadas pelos processos
+# que executam os backtests em paralelo.
+
+# Dias entre o ordinal 1 do calendário (base das datas do backtrader) e 1970-01-01
+_ORDINAL_EPOCH = 719163
+
+class Equity(bt.Analyzer):
+    # Patrimônio, caixa e valor em posições de cada pregão gravados em um buffer
+    # NumPy pré-alocado com o tamanho dos dados (cresce só se a carteira tiver
+    # mais pregões que o primeiro ativo). 'equity' e 'dataframe()' são vistas do buffer.
+    # 'posicao' é o valor de mercado de todas as posições (patrimônio - caixa),
+    # não a quantidade do primeiro ativo: numa carteira há um feed por ativo
+    colunas = ['valor', 'caixa', 'posicao']
+
+    def start(self):
+        self._buffer = np.empty((max(self.strategy.data.buflen(), 1), len(self.colunas)), dtype='float64')
+        self._tempos = np.empty(len(self._buffer), dtype='float64')
+        self._n = 0
+
+    def next(self):
+        if self._n == len(self._buffer):
+            self._buffer = np.concatenate((self._buffer, np.empty_like(self._buffer)))
+            self._tempos = np.concatenate((self._tempos, np.empty_like(self._tempos)))
+        broker = self.strategy.broker
+        valor, caixa = broker.getvalue(), broker.getcash()
+        self._buffer[self._n] = (valor, caixa, valor - caixa)
+        self._tempos[self._n] = self.strategy.datetime[0]
+        self._n += 1
+
+    @property
+    def equity(self):
+        return self._buffer[:self._n, 0]
+
+    @property
+    def indice(self):
+        segundos = (self._tempos[:self._n] - _ORDINAL_EPOCH) * 86400.0
+        return pd.DatetimeIndex(pd.to_datetime(segundos.round(6), unit='s'), name='Date')
+
+    def dataframe(self):
+        return pd.DataFrame(self._buffer[:self._n], index=self.indice, columns=self.colunas, copy=False)
+
+    def get_analysis(self):
+        return self.dataframe()
+
+
+class Operacoes(bt.Analyzer):
+    # Retorno de cada operação encerrada sobre o patrimônio de antes da entrada
+    # (o do fechamento anterior), indexado pela data da saída: a entrada da
+    # simulação de Monte Carlo (montecarlo.py)
+    def start(self):
+        self._valor_anterior = self.strategy.broker.getvalue()
+        self._valor_entrada = {}
+        self._datas, self._retornos = [], []
+
+    def notify_trade(self, trade):
+        if trade.justopened:
+            self._valor_entrada[trade.ref] = self._valor_anterior
+        elif trade.isclosed:
+            self._datas.append(self.strategy.datetime[0])
+            self._retornos.append(trade.pnlcomm / self._valor_entrada.pop(trade.ref))
+
+    def next(self):
+        self._valor_anterior = self.strategy.broker.getvalue()
+
+    @property
+    def serie(self):
+        segundos = (np.asarray(self._datas, dtype='float64') - _ORDINAL_EPOCH) * 86400.0
+        indice = pd.DatetimeIndex(pd.to_datetime(segundos.round(6), unit='s'), name='Date')
+        return pd.Series(self._retornos, index=indice, dtype='float64')
+
+    def get_analysis(self):
+        return self.serie
+
+class StrategyStochasticSlow(bt.Strategy):
+    def __init__(self):
+        self.stoch = bt.ind.StochasticSlow()
+    def next(self):
+        if not self.position and self.stoch.percK[0] < 20:
+            self.buy()
+        elif self.stoch.percK[0] > 80:
+            self.close()
+
+class StrategySMACross(bt.Strategy):
+    params = (("fast", 10), ("slow", 30),)
+    def __init__(self):
+        sma1 = bt.ind.SMA(period=self.params.fast)
+        sma2 = bt.ind.SMA(period=self.params.slow)
+        self.crossover = bt.ind.CrossOver(sma1, sma2)
+    def next(self):
+        if not self.position and self.crossover > 0:
+            self.buy()
+        elif self.position and self.crossover < 0:
+            self.close()
+
+class StrategyEMACross(bt.Strategy):
+    def __init__(self):
+        ema1 = bt.ind.EMA(period=12)
+        ema2 = bt.ind.EMA(period=26)
+        self.crossover = bt.ind.CrossOver(ema1, ema2)
+    def next(self):
+        if not self.position and self.crossover > 0:
+            self.buy()
+        elif self.position and self.crossover < 0:
+            self.close()
+
+class StrategyBollinger(bt.Strategy):
+    def __init__(self):
+        self.bb = bt.ind.BollingerBands()
+    def next(self):
+        if not self.position and self.data.close[0] < self.bb.lines.bot[0]:
+            self.buy()
+        elif self.position and self.data.close[0] > self.bb.lines.top[0]:
+            self.close()
+
+class StrategyRSI(bt.Strategy):
+    def __init__(self):
+        self.rsi = bt.ind.RSI(period=14)
+    def next(self):
+        if not self.position and self.rsi < 30:
+            self.buy()
+        elif self.position and self.rsi > 70:
+            self.close()
+
+class StrategyMACD(bt.Strategy):
+    def __init__(self):
+        self.macd = bt.ind.MACD()
+    def next(self):
+        if not self.position and self.macd.macd[0] > self.macd.signal[0]:
+            self.buy()
+        elif self.position and self.macd.macd[0] < self.macd.signal[0]:
+            self.close()
+
+class StrategyADX(bt.Strategy):
+    def __init__(self):
+        self.adx = bt.ind.ADX()
+    def next(self):
+        if not self.position and self.adx > 25:
+            self.buy()
+        elif self.position and self.adx < 20:
+            self.close()
+
+class StrategyMomentum(bt.Strategy):
+    def __init__(self):
+        self.mom = bt.ind.Momentum(period=10)
+    def next(self):
+        if not self.position and self.mom > 0:
+            self.buy()
+        elif self.position and self.mom < 0:
+            self.close()
+
+class StrategyIchimoku(bt.Strategy):
+    def __init__(self):
+        self.ichi = bt.ind.Ichimoku()
+    def next(self):
+        if not self.position and self.data.close[0] > self.ichi.senkou_span_a[0]:
+            self.buy()
+        elif self.position and self.data.close[0] < self.ichi.senkou_span_b[0]:
+            self.close()
+
+class StrategyMARSI(bt.Strategy):
+    def __init__(self):
+        self.sma = bt.ind.SMA(period=14)
+        self.rsi = bt.ind.RSI(period=14)
+    def next(self):
+        if not self.position and self.data.close[0] > self.sma and self.rsi < 30:
+            self.buy()
+        elif self.position and self.rsi > 70:
+            self.close()
+
+class StrategyMovingAverageVolatility(bt.Strategy):
+    params = dict(fast=10, slow=30, vol_window=20, vol_threshold=0.02)
+    def __init__(self):
+        self.ma_fast = bt.indicators.SMA(self.data.close, period=self.p.fast)
+        self.ma_slow = bt.indicators.SMA(self.data.close, period=self.p.slow)
+        self.returns = bt.indicators.PercentChange(self.data.close)
+        self.volatility = bt.indicators.StandardDeviation(self.returns, period=self.p.vol_window)
+    def next(self):
+        if not self.position and self.ma_fast[0] > self.ma_slow[0] and self.volatility[0] > self.p.vol_threshold:
+            self.buy()
+        elif self.ma_fast[0] < self.ma_slow[0]:
+            self.close()
+
+class StrategyMomentumTrailing(bt.Strategy):
+    params = dict(momentum_period=15, stop_loss=0.05, take_profit=0.10)
+    def __init__(self):
+        self.momentum = bt.ind.ROC(self.data.close, period=self.p.momentum_period)
+        self.entry_price = None
+    def next(self):
+        if not self.position and self.momentum[0] > 0:
+            self.buy()
+            self.entry_price = self.data.close[0]
+        elif self.entry_price:
+            if self.data.close[0] < self.entry_price * (1 - self.p.stop_loss) or self.data.close[0] > self.entry_price * (1 + self.p.take_profit):
+                self.close()
+
+# -------------------------
+# 📈 Novas Estratégias Quantitativas
+# -------------------------
+
+class EstrategiaMediaCruzada(bt.Strategy):
+    params = (("periodo_curto", 20), ("periodo_longo", 50),)
+
+    def __init__(self):
+        self.media_curta = bt.indicators.SimpleMovingAverage(self.data.close, period=self.params.periodo_curto)
+        self.media_longa = bt.indicators.SimpleMovingAverage(self.data.close, period=self.params.periodo_longo)
+
+    def next(self):
+        if self.media_curta[0] > self.media_longa[0] and self.media_curta[-1] <= self.media_longa[-1]:
+            self.buy()
+        elif self.media_curta[0] < self.media_longa[0] and self.media_curta[-1] >= self.media_longa[-1]:
+            self.sell()
+
+class EstrategiaRSI(bt.Strategy):
+    def __init__(self):
+        self.rsi = bt.indicators.RSI(self.data.close)
+
+    def next(self):
+        if self.rsi < 30:
+            self.buy()
+        elif self.rsi > 70:
+            self.sell()
+
+class EstrategiaBollinger(bt.Strategy):
+    def __init__(self):
+        self.bb = bt.indicators.BollingerBands(self.data.close)
+
+    def next(self):
+        if self.data.close[0] < self.bb.lines.bot[0]:
+            self.buy()
+        elif self.data.close[0] > self.bb.lines.top[0]:
+            self.sell()
+
+class EstrategiaMACD(bt.Strategy):
+    def __init__(self):
+        self.macd = bt.indicators.MACD(self.data)
+        self.cross = bt.indicators.CrossOver(self.macd.macd, self.macd.signal)
+
+    def next(self):
+        if self.cross > 0:
+            self.buy()
+        elif self.cross < 0:
+            self.sell()
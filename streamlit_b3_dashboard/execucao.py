@@ -0,0 +1,293 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import backtrader as bt
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+import estrategias as modulo_estrategias
+from armazem import ARMAZEM_RESULTADOS
+from cache_indicadores import CACHE_INDICADORES
+from desempenho import SEM_MEDICAO, Medidor
+from registro import carregar_classe, obter, suporta_vetorizado
+from vetorizado import drawdown_maximo, executar_vetorizado, sharpe_anual
+
+# -------------------------
+# 🏭 Execução dos backtests em paralelo
+# -------------------------
+# Cada job é um dicionário independente:
+#   {'ativos': [...], 'estrategia': 'StrategySMACross', 'params': {...},
+#    'caixa': 10000, 'comissao': 0.0, 'percentual': None,
+#    'motor': 'backtrader' | 'vetorizado', 'grafico': False, 'somente_metricas': False,
+#    'medir': False, 'inicio': None, 'fim': None}
+# Os resultados trazem 'operacoes': o retorno de cada operação encerrada,
+# indexado pela data da saída (ver montecarlo.py).
+# Com 'estrategias': [nome, ...] no lugar de 'estrategia', o job avalia todas as
+# estratégias sobre os mesmos feeds, numa única chamada, e devolve
+# {'estrategias': [resultado, ...]} na mesma ordem. Com 'medir', o resultado
+# traz também 'desempenho': as etapas medidas no worker (ver desempenho.py).
+# Com 'inicio', os pregões anteriores a ele (o aquecimento carregado a mais por
+# dados.carregar_universo) só alimentam os indicadores: as estratégias operam e
+# as métricas são contadas a partir de 'inicio'. Com 'fim' (exclusivo), a curva e
+# as métricas param nele; os preços seguem inteiros, para que todas as janelas de
+# um walk-forward usem os mesmos indicadores em cache.
+# Os preços do universo são entregues uma única vez a cada processo (no
+# initializer), e não a cada job, ou
+# abertos por ele direto do disco, quando vêm numa MatrizPrecos. Os resultados voltam na mesma ordem dos jobs.
+
+_PRECOS = {}
+
+
+def _iniciar_worker(precos):
+    global _PRECOS
+    _PRECOS = precos
+
+
+class CerebroFeedsCompartilhados(bt.Cerebro):
+    # Cada estratégia roda numa passada própria, com o broker reiniciado (caixa,
+    # posições e ordens isolados), como no modo de otimização do backtrader; os
+    # feeds, porém, são carregados só na primeira passada e reaproveitados nas
+    # seguintes, como o próprio Cerebro faz ao otimizar em vários processos.
+    params = (('maxcpus', 1), ('optreturn', False))
+
+    def __init__(self, medidor=SEM_MEDICAO):
+        super().__init__()
+        self.medidor = medidor
+        self._feeds_carregados = False
+
+    def adicionar_estrategias(self, estrategias):
+        # Uma única lista de alternativas em self.strats = uma passada por estratégia
+        self._dooptimize = True
+        self.strats.append([(classe, (), params or {}) for classe, params in estrategias])
+
+    def runstrategies(self, iterstrat, predata=False):
+        if not (self._dopreload and self._dorunonce):
+            return super().runstrategies(iterstrat, predata=predata)
+
+        if not self._feeds_carregados:
+            # A mesma preparação que o Cerebro.run faz antes de otimizar em vários processos
+            with self.medidor.etapa("feed (PandasData)"):
+                for data in self.datas:
+                    data.reset()
+                    if self._exactbars < 1:
+                        data.extend(size=self.params.lookahead)
+                    data._start()
+                    data.preload()
+            self._feeds_carregados = True
+
+        with self.medidor.etapa(f"cerebro.run {iterstrat[0][0].__name__}"):
+            return super().runstrategies(iterstrat, predata=True)
+
+
+def _operando_a_partir_de(classe, inicio):
+    # Os indicadores aquecem nos pregões anteriores a 'inicio'; a estratégia só decide a partir dele
+    inicio = pd.Timestamp(inicio).date()
+
+    class Operando(classe):
+        def next(self):
+            if self.datetime.date(0) >= inicio:
+                super().next()
+
+    Operando.__name__ = classe.__name__
+    return Operando
+
+
+def _recortar_periodo(resultado, inicio, fim, caixa):
+    # Descarta o trecho de aquecimento (patrimônio parado no caixa) e o que vier
+    # depois de 'fim', e refaz as métricas sobre o período pedido
+    datas = pd.DatetimeIndex(resultado['datas'])
+    k = 0 if inicio is None else int(datas.searchsorted(pd.Timestamp(inicio)))
+    j = len(datas) if fim is None else int(datas.searchsorted(pd.Timestamp(fim)))
+    if (k == 0 and j == len(datas)) or k >= j:
+        return resultado
+    equity = np.asarray(resultado['equity'], dtype='float64')[k:j]
+    datas = datas[k:j]
+    resultado.update(equity=equity, datas=datas, sharpe=sharpe_anual(datas, equity, caixa),
+                     drawdown=drawdown_maximo(equity), valor_final=float(equity[-1]))
+    for chave in ('compras', 'vendas'):
+        if chave in resultado:
+            resultado[chave] = resultado[chave][(resultado[chave] >= datas[0]) & (resultado[chave] <= datas[-1])]
+    if 'operacoes' in resultado:
+        operacoes = resultado['operacoes']
+        resultado['operacoes'] = operacoes[(operacoes.index >= datas[0]) & (operacoes.index <= datas[-1])]
+    return resultado
+
+
+def executar_cerebro_varias(quadros, estrategias, caixa=10000.0, comissao=0.0, percentual=None, grafico=False,
+                            medidor=SEM_MEDICAO, inicio=None):
+    # 'estrategias' = [(nome, params), ...]; devolve um resultado por estratégia
+    cerebro = CerebroFeedsCompartilhados(medidor)
+    cerebro.broker.setcash(caixa)
+    if comissao:
+        cerebro.broker.setcommission(commission=comissao)
+    if percentual:
+        cerebro.addsizer(bt.sizers.PercentSizer, percents=percentual)
+
+    for nome, df in quadros:
+        cerebro.adddata(bt.feeds.PandasData(dataname=df), name=nome)
+    classes = [carregar_classe(nome) for nome, _ in estrategias]
+    if inicio is not None:
+        classes = [_operando_a_partir_de(classe, inicio) for classe in classes]
+    cerebro.adicionar_estrategias([(classe, params) for classe, (_, params) in zip(classes, estrategias)])
+    cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe')
+    cerebro.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
+    cerebro.addanalyzer(modulo_estrategias.Equity, _name='equity')
+    cerebro.addanalyzer(modulo_estrategias.Operacoes, _name='operacoes')
+
+    resultados = []
+    for i, (r,) in enumerate(cerebro.run()):
+        nome = type(r).__name__
+        with medidor.etapa(f"métricas {nome}"):
+            equity = r.analyzers.equity.equity
+            resultados.append({
+                'equity': equity,
+                'datas': r.analyzers.equity.indice,
+                'operacoes': r.analyzers.operacoes.serie,
+                'sharpe': r.analyzers.sharpe.get_analysis().get('sharperatio'),
+                'drawdown': r.analyzers.drawdown.get_analysis()['max']['drawdown'],
+                # O broker é compartilhado entre as passadas: o valor final vem da curva de cada uma
+                'valor_final': float(equity[-1]),
+            })
+
+        if grafico:
+            # O gráfico é gerado no próprio processo e volta como PNG (figuras não atravessam processos bem).
+            # cerebro.plot() desenharia todas as passadas na mesma figura; aqui cada uma ganha a sua.
+            with medidor.etapa(f"gráfico {nome}"):
+                from backtrader import plot as plot_bt  # como no Cerebro.plot: só depois do pyplot
+                fig = plot_bt.Plot(style='candlestick').plot(r, figid=i, iplot=False)[0]
+                buffer = io.BytesIO()
+                fig.savefig(buffer, format='png')
+                plt.close(fig)
+                resultados[-1]['grafico'] = buffer.getvalue()
+    return resultados
+
+
+def executar_cerebro(quadros, nome_estrategia, params=None, caixa=10000.0, comissao=0.0, percentual=None, grafico=False,
+                     inicio=None):
+    return executar_cerebro_varias(quadros, [(nome_estrategia, params)], caixa=caixa, comissao=comissao,
+                                   percentual=percentual, grafico=grafico, inicio=inicio)[0]
+
+
+def _contagem_indicadores():
+    return CACHE_INDICADORES.acertos, CACHE_INDICADORES.faltas
+
+
+def _executar_job(job, medidor=SEM_MEDICAO):
+    quadros = [(ticker, _PRECOS[ticker]) for ticker in job['ativos']]
+    caixa = job.get('caixa', 10000.0)
+    nomes = job['estrategias'] if 'estrategias' in job else [job['estrategia']]
+    resultados = [None] * len(nomes)
+    # Estratégia ou parâmetro desconhecido vira o 'erro' do job antes de qualquer cálculo
+    for nome in nomes:
+        obter(nome).parametros(job.get('params'))
+
+    # O motor vetorizado atende um ativo por vez e não gera o gráfico do Cerebro
+    if job.get('motor') == 'vetorizado' and len(quadros) == 1 and not job.get('grafico'):
+        for i, nome in enumerate(nomes):
+            if suporta_vetorizado(nome):
+                with medidor.etapa(f"vetorizado {nome}", cache=_contagem_indicadores):
+                    resultados[i] = executar_vetorizado(quadros[0][1], nome, job.get('params'), caixa=caixa,
+                                                        comissao=job.get('comissao', 0.0), percentual=job.get('percentual'),
+                                                        ticker=quadros[0][0], inicio=job.get('inicio'))
+                resultados[i]['valor_final'] = float(resultados[i]['equity'][-1])
+
+    # As demais passam juntas pelo Cerebro, sobre os mesmos feeds
+    restantes = [i for i, r in enumerate(resultados) if r is None]
+    if restantes:
+        feitos = executar_cerebro_varias(quadros, [(nomes[i], job.get('params')) for i in restantes], caixa=caixa,
+                                         comissao=job.get('comissao', 0.0), percentual=job.get('percentual'),
+                                         grafico=job.get('grafico', False), medidor=medidor, inicio=job.get('inicio'))
+        for i, resultado in zip(restantes, feitos):
+            resultados[i] = resultado
+
+    if job.get('inicio') is not None or job.get('fim') is not None:
+        for resultado in resultados:
+            _recortar_periodo(resultado, job.get('inicio'), job.get('fim'), caixa)
+
+    return {'estrategias': resultados} if 'estrategias' in job else resultados[0]
+
+
+def executar_job(job):
+    medidor = Medidor(origem=f"worker {os.getpid()}") if job.get('medir') else SEM_MEDICAO
+    resultado = _executar_job(job, medidor)
+    if job.get('medir'):
+        resultado['desempenho'] = medidor.etapas
+    if job.get('somente_metricas'):
+        # Varreduras de parâmetros: só os números voltam do worker, sem a curva de patrimônio
+        for r in resultado.get('estrategias', [resultado]):
+            for chave in ('equity', 'datas', 'compras', 'vendas', 'operacoes'):
+                r.pop(chave, None)
+    return resultado
+
+
+def _executar_lote(jobs):
+    resultados = []
+    for job in jobs:
+        try:
+            resultados.append(executar_job(job))
+        except Exception as e:
+            resultados.append({'erro': f"{type(e).__name__}: {e}"})
+    return resultados
+
+
+def executar_em_paralelo(precos, jobs, processos=None, ao_concluir=None, armazem=ARMAZEM_RESULTADOS):
+    # Distribui os jobs entre os núcleos e devolve os resultados na ordem dos
+    # jobs. 'ao_concluir(indice, resultado)' é chamado no processo principal à
+    # medida que cada job termina (barra de progresso, resultados parciais).
+    # Com o 'armazem' (armazem.py), as estratégias já calculadas com os mesmos
+    # preços, código e parâmetros saem do disco e só as novas vão para os
+    # workers; armazem=None calcula tudo.
+    if armazem is None:
+        return _distribuir(precos, jobs, processos, ao_concluir)
+
+    resultados, pendentes = armazem.separar(precos, jobs)
+    if ao_concluir:
+        for i, resultado in enumerate(resultados):
+            if resultado is not None:
+                ao_concluir(i, resultado)
+
+    novos = []
+    def concluir(k, resultado):
+        i, _, faltando, servidos = pendentes[k]
+        resultados[i], gravar = armazem.juntar(jobs[i], resultado, faltando, servidos)
+        novos.extend(gravar)
+        if ao_concluir:
+            ao_concluir(i, resultados[i])
+
+    _distribuir(precos, [job for _, job, _, _ in pendentes], processos, concluir)
+    armazem.gravar(novos)
+    return resultados
+
+
+def _distribuir(precos, jobs, processos=None, ao_concluir=None):
+    processos = processos or os.cpu_count() or 1
+    # Uma MatrizPrecos (matriz.py) segue inteira: no pickle vai só o caminho do
+    # arquivo, e cada worker abre a matriz em mmap em vez de receber cópias dos quadros
+    if isinstance(precos, dict):
+        necessarios = {ticker for job in jobs for ticker in job['ativos']}
+        precos = {ticker: df for ticker, df in precos.items() if ticker in necessarios}
+    resultados = [None] * len(jobs)
+
+    if processos == 1 or len(jobs) <= 1:
+        _iniciar_worker(precos)
+        for i, job in enumerate(jobs):
+            resultados[i] = _executar_lote([job])[0]
+            if ao_concluir:
+                ao_concluir(i, resultados[i])
+        return resultados
+
+    # Jobs agrupados em lotes para diluir o custo de comunicação entre processos
+    # (um backtest vetorizado leva milissegundos)
+    tamanho_lote = max(1, len(jobs) // (processos * 4))
+    lotes = [list(range(i, min(i + tamanho_lote, len(jobs)))) for i in range(0, len(jobs), tamanho_lote)]
+
+    with ProcessPoolExecutor(max_workers=min(processos, len(lotes)), initializer=_iniciar_worker, initargs=(precos,)) as executor:
+        futuros = {executor.submit(_executar_lote, [jobs[i] for i in lote]): lote for lote in lotes}
+        for futuro in as_completed(futuros):
+            for i, resultado in zip(futuros[futuro], futuro.result()):
+                resultados[i] = resultado
+                if ao_concluir:
+                    ao_concluir(i, resultado)
+    return resultados
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+# -------------------------
+# 📈 Curvas de patrimônio reduzidas para a tela
+# -------------------------
+# Vinte anos de pregões são ~5 mil pontos por curva; com vários pares
+# ativo/estratégia o gráfico fica pesado para montar e para o navegador. As
+# curvas são reduzidas ao número de pontos que cabe na largura do gráfico pelo
+# LTTB (Largest-Triangle-Three-Buckets), que mantém picos, vales e quedas
+# visíveis, ao contrário de pegar um ponto a cada N.
+
+PONTOS_TELA = 1000
+
+
+def indices_lttb(valores, pontos=PONTOS_TELA):
+    # Índices dos pontos escolhidos (sempre inclui o primeiro e o último)
+    valores = np.asarray(valores, dtype='float64')
+    n = len(valores)
+    if pontos >= n or pontos < 3:
+        return np.arange(n)
+
+    # pontos - 2 baldes entre o primeiro e o último ponto; de cada balde sai o
+    # ponto que forma o maior triângulo com o escolhido no balde anterior e a
+    # média do balde seguinte
+    limites = np.linspace(1, n - 1, pontos - 1).astype(int)
+    escolhidos = np.empty(pontos, dtype=int)
+    escolhidos[0], escolhidos[-1] = 0, n - 1
+    a = 0
+    for i in range(pontos - 2):
+        inicio, fim = limites[i], limites[i + 1]
+        prox_fim = limites[i + 2] if i + 2 < len(limites) else n
+        media_x = (fim + prox_fim - 1) / 2
+        media_y = valores[fim:prox_fim].mean()
+
+        x = np.arange(inicio, fim)
+        area = np.abs((a - media_x) * (valores[inicio:fim] - valores[a]) - (a - x) * (media_y - valores[a]))
+        a = inicio + int(np.argmax(area))
+        escolhidos[i + 1] = a
+    return escolhidos
+
+
+def reduzir_curva(datas, equity, pontos=PONTOS_TELA):
+    # O eixo x do LTTB é a posição do pregão: fins de semana e feriados não distorcem a escolha
+    indices = indices_lttb(equity, pontos)
+    return pd.DataFrame({
+        'Data': pd.DatetimeIndex(datas)[indices],
+        'Patrimônio (R$)': np.asarray(equity, dtype='float64')[indices],
+    })
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from dados import COLUNAS_OHLCV, PASTA_CACHE
+
+# -------------------------
+# 🗄️ Matriz de preços do universo em disco (memory-mapped)
+# -------------------------
+# Na triagem, cada worker do pool recebia (por pickle) um DataFrame por ativo,
+# e a memória crescia com o número de processos. Aqui o OHLCV de todos os
+# ativos é alinhado num calendário comum de pregões (a união das datas dos
+# ativos: feriados da B3 não aparecem em nenhum) e gravado como uma matriz
+# ativo × data × campo num arquivo .npy. Os workers recebem só o caminho e
+# abrem o arquivo com mmap: as páginas são compartilhadas pelo sistema
+# operacional e os quadros de cada ativo são vistas da matriz, sem cópia.
+
+PASTA_MATRIZES = os.path.join(PASTA_CACHE, "matrizes")
+
+
+def _caminhos(base):
+    return base + ".npy", base + ".datas.npy", base + ".json"
+
+
+def salvar_matriz(precos, base, dtype='float64'):
+    # 'precos' = {ticker: OHLCV}; datas sem pregão do ativo ficam com NaN
+    tickers = list(precos)
+    campos = [coluna for coluna in COLUNAS_OHLCV if any(coluna in df.columns for df in precos.values() if not df.empty)]
+    calendario = pd.DatetimeIndex(sorted(set().union(*(df.index for df in precos.values()))), name='Date')
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    caminho_matriz, caminho_datas, caminho_meta = _caminhos(base)
+
+    # Gravado em arquivos temporários e trocado de uma vez: quem já abriu a matriz anterior continua com ela
+    matriz = np.lib.format.open_memmap(caminho_matriz + ".tmp", mode='w+', dtype=dtype,
+                                       shape=(len(tickers), len(calendario), len(campos)))
+    faixas = []
+    for i, ticker in enumerate(tickers):
+        df = precos[ticker]
+        matriz[i] = np.nan
+        if df.empty:
+            faixas.append((0, 0, False))
+            continue
+        posicoes = calendario.get_indexer(df.index)
+        matriz[i, posicoes] = df.reindex(columns=campos).to_numpy(dtype=dtype)
+        # Pregões do calendário em que o ativo não negociou (suspensão) quebram a faixa contínua
+        inicio, fim = int(posicoes[0]), int(posicoes[-1]) + 1
+        faixas.append((inicio, fim, len(df) != fim - inicio))
+    matriz.flush()
+    del matriz
+
+    with open(caminho_datas + ".tmp", "wb") as f:
+        np.save(f, calendario.asi8)
+    with open(caminho_meta + ".tmp", "w") as f:
+        json.dump({'tickers': tickers, 'campos': campos, 'faixas': faixas}, f)
+    for caminho in (caminho_matriz, caminho_datas, caminho_meta):
+        os.replace(caminho + ".tmp", caminho)
+    return MatrizPrecos(base)
+
+
+def matriz_universo(precos, chave, dtype='float64'):
+    # Um arquivo por chamada: a matriz só é necessária enquanto os workers
+    # rodam, e quem chama a apaga com remover_matriz() ao terminar. O sufixo
+    # aleatório evita que duas sessões com o mesmo pedido disputem o arquivo
+    nome = f"{hashlib.sha1(repr(chave).encode()).hexdigest()[:16]}-{uuid.uuid4().hex[:8]}"
+    return salvar_matriz(precos, os.path.join(PASTA_MATRIZES, nome), dtype=dtype)
+
+
+def remover_matriz(matriz):
+    # No Windows um arquivo ainda aberto em mmap não sai; fica para limpar_matrizes()
+    for caminho in _caminhos(matriz.base):
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
+
+def limpar_matrizes(idade_min=60):
+    # Sobras de execuções interrompidas; as mais recentes que 'idade_min' podem estar em uso
+    if not os.path.isdir(PASTA_MATRIZES):
+        return
+    limite = time.time() - idade_min * 60
+    for nome in os.listdir(PASTA_MATRIZES):
+        caminho = os.path.join(PASTA_MATRIZES, nome)
+        try:
+            if os.path.getmtime(caminho) < limite:
+                os.remove(caminho)
+        except OSError:
+            pass
+
+
+class MatrizPrecos:
+    # Funciona como o dicionário {ticker: OHLCV} esperado por execucao.py; no
+    # pickle só vai o caminho, e cada processo abre a própria visão do arquivo
+    def __init__(self, base):
+        self.base = base
+        caminho_matriz, caminho_datas, caminho_meta = _caminhos(base)
+        self.dados = np.load(caminho_matriz, mmap_mode='r')
+        self.datas = pd.DatetimeIndex(np.load(caminho_datas), name='Date')
+        with open(caminho_meta) as f:
+            meta = json.load(f)
+        self.tickers = meta['tickers']
+        self.campos = meta['campos']
+        self._faixas = meta['faixas']
+        self._posicao = {ticker: i for i, ticker in enumerate(self.tickers)}
+
+    def __reduce__(self):
+        return MatrizPrecos, (self.base,)
+
+    def __getitem__(self, ticker):
+        i = self._posicao[ticker]
+        inicio, fim, lacunas = self._faixas[i]
+        bloco, indice = self.dados[i, inicio:fim], self.datas[inicio:fim]
+        if lacunas:
+            # Só aqui há cópia: as linhas sem pregão do ativo são descartadas
+            negociou = ~np.isnan(bloco[:, self.campos.index('Close')])
+            bloco, indice = bloco[negociou], indice[negociou]
+        return pd.DataFrame(bloco, index=indice, columns=self.campos, copy=False)
+
+    def __contains__(self, ticker):
+        return ticker in self._posicao
+
+    def __iter__(self):
+        return iter(self.tickers)
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def keys(self):
+        return list(self.tickers)
+
+    def items(self):
+        return ((ticker, self[ticker]) for ticker in self.tickers)
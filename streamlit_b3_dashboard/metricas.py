@@ -0,0 +1,117 @@
+import numpy as np
+
+# -------------------------
+# 📊 Métricas de Performance (vetorizadas)
+# -------------------------
+# Todas as funções aceitam um vetor de retornos (uma curva) ou uma matriz
+# (curvas x períodos) e operam ao longo do último eixo, de modo que milhares
+# de curvas são avaliadas de uma vez, sem laços em Python.
+
+PERIODOS_ANO = 252
+
+
+def retornos_de_equity(equity):
+    equity = np.asarray(equity, dtype='float64')
+    return equity[..., 1:] / equity[..., :-1] - 1.0
+
+
+def _curva(retornos):
+    return np.cumprod(1.0 + retornos, axis=-1)
+
+
+def retorno_total(retornos):
+    return _curva(retornos)[..., -1] - 1.0
+
+
+def retorno_anualizado(retornos, periodos_ano=PERIODOS_ANO):
+    n = retornos.shape[-1]
+    return (1.0 + retorno_total(retornos)) ** (periodos_ano / n) - 1.0
+
+
+def volatilidade(retornos, periodos_ano=PERIODOS_ANO):
+    return np.std(retornos, axis=-1) * np.sqrt(periodos_ano)
+
+
+def sharpe(retornos, periodos_ano=PERIODOS_ANO):
+    desvio = np.std(retornos, axis=-1)
+    media = np.mean(retornos, axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(desvio != 0, media / desvio * np.sqrt(periodos_ano), 0.0)
+
+
+def sortino(retornos, periodos_ano=PERIODOS_ANO):
+    # Desvio só das perdas (semidesvio em torno de zero)
+    desvio_baixa = np.sqrt(np.mean(np.minimum(retornos, 0.0) ** 2, axis=-1))
+    media = np.mean(retornos, axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(desvio_baixa != 0, media / desvio_baixa * np.sqrt(periodos_ano), 0.0)
+
+
+def drawdowns(retornos):
+    # Queda relativa ao pico de cada curva (o pico parte do primeiro ponto da curva)
+    curva = _curva(retornos)
+    pico = np.maximum.accumulate(curva, axis=-1)
+    return (pico - curva) / pico
+
+
+def drawdown_maximo(retornos):
+    return np.max(drawdowns(retornos), axis=-1)
+
+
+def duracao_drawdown(retornos):
+    # Maior sequência de períodos abaixo do pico anterior
+    abaixo = drawdowns(retornos) > 0
+    posicoes = np.broadcast_to(np.arange(abaixo.shape[-1]), abaixo.shape)
+    ultimo_pico = np.maximum.accumulate(np.where(abaixo, -1, posicoes), axis=-1)
+    return np.max(posicoes - ultimo_pico, axis=-1)
+
+
+def calmar(retornos, periodos_ano=PERIODOS_ANO):
+    dd = drawdown_maximo(retornos)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(dd != 0, retorno_anualizado(retornos, periodos_ano) / dd, 0.0)
+
+
+def metricas_matriz(retornos, periodos_ano=PERIODOS_ANO):
+    # Todas as métricas de uma vez para uma curva ou uma matriz de curvas
+    retornos = np.asarray(retornos, dtype='float64')
+    curva = _curva(retornos)
+    pico = np.maximum.accumulate(curva, axis=-1)
+    dd = (pico - curva) / pico
+    dd_max = np.max(dd, axis=-1)
+
+    abaixo = dd > 0
+    posicoes = np.broadcast_to(np.arange(abaixo.shape[-1]), abaixo.shape)
+    ultimo_pico = np.maximum.accumulate(np.where(abaixo, -1, posicoes), axis=-1)
+
+    total = curva[..., -1] - 1.0
+    anual = (1.0 + total) ** (periodos_ano / retornos.shape[-1]) - 1.0
+    media = np.mean(retornos, axis=-1)
+    desvio = np.std(retornos, axis=-1)
+    desvio_baixa = np.sqrt(np.mean(np.minimum(retornos, 0.0) ** 2, axis=-1))
+    raiz = np.sqrt(periodos_ano)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'retorno_total': total,
+            'retorno_anualizado': anual,
+            'volatilidade': desvio * raiz,
+            'sharpe': np.where(desvio != 0, media / desvio * raiz, 0.0),
+            'sortino': np.where(desvio_baixa != 0, media / desvio_baixa * raiz, 0.0),
+            'calmar': np.where(dd_max != 0, anual / dd_max, 0.0),
+            'drawdown_maximo': dd_max,
+            'duracao_drawdown': np.max(posicoes - ultimo_pico, axis=-1),
+        }
+
+
+def calcular_metricas(retornos_diarios):
+    # Retorno total, volatilidade, Sharpe e drawdown (em %) de uma série de retornos diários
+    retornos = np.asarray(retornos_diarios, dtype='float64')
+    if retornos.size == 0:
+        return 0.0, 0.0, 0, 0.0
+    m = metricas_matriz(retornos)
+    return (
+        round(float(m['retorno_total']) * 100, 2),
+        round(float(m['volatilidade']) * 100, 2),
+        round(float(m['sharpe']), 2),
+        round(float(m['drawdown_maximo']) * 100, 2),
+    )
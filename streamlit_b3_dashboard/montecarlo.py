@@ -0,0 +1,105 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# -------------------------
+# 🎲 Monte Carlo das operações
+# -------------------------
+# Um backtest é uma única ordem de operações: a mesma estratégia, com as
+# operações em outra ordem (ou com outra amostra delas), teria outro drawdown e
+# outro retorno final. Aqui os retornos das operações encerradas de cada
+# estratégia são reordenados ('embaralhar': o retorno final não muda, só o
+# caminho) ou sorteados com reposição ('reamostrar', bootstrap) em milhares de
+# trajetórias, e o que sai são faixas de percentis do retorno final e do
+# drawdown máximo. Todas as estratégias vão numa única matriz
+# estratégia × trajetória × operação: as que têm menos operações são completadas
+# com retorno zero, que não move a curva nem o pico. As trajetórias acumulam
+# log(1 + retorno) em float32: metade da memória percorrida, precisão de sobra
+# para percentis e sem estouro quando o patrimônio multiplica milhões de vezes
+# (o fator só volta a ser exponenciado nos percentis, em float64). As
+# trajetórias são processadas em blocos que cabem em LIMITE_MB.
+
+MODOS = {"Reamostrar (com reposição)": 'reamostrar', "Embaralhar a ordem": 'embaralhar'}
+PERCENTIS = (5, 25, 50, 75, 95)
+LIMITE_MB = float(os.environ.get("B3_MONTECARLO_MB", "256"))
+
+# Memória por ponto estratégia × trajetória × operação no pior momento do
+# sorteio: números sorteados e escalados (float32) e índice (intp), com folga
+_BYTES_POR_PONTO = 20
+# Uma perda total vira um patrimônio residual ínfimo, não log(0) = -inf
+_PERDA_TOTAL = -1.0 + 1e-9
+
+
+def _matriz_operacoes(retornos_por_estrategia):
+    # Estratégia × operação em log(1 + retorno), completada com zeros; devolve também o nº de operações de cada uma
+    quantidades = np.array([len(r) for r in retornos_por_estrategia], dtype=np.int64)
+    matriz = np.zeros((len(quantidades), max(quantidades.max(initial=0), 1)), dtype=np.float32)
+    for i, retornos in enumerate(retornos_por_estrategia):
+        matriz[i, :quantidades[i]] = np.log1p(np.maximum(retornos, _PERDA_TOTAL))
+    return matriz, quantidades
+
+
+def _trajetorias(matriz, quantidades, n, modo, rng):
+    if modo == 'reamostrar':
+        # Cada posição sorteia uma das operações da própria estratégia; as posições excedentes ficam em zero
+        sorteio = rng.random((len(quantidades), n, matriz.shape[1]), dtype=np.float32)
+        sorteio = (sorteio * quantidades[:, None, None].astype(np.float32)).astype(np.intp)
+        np.minimum(sorteio, np.maximum(quantidades - 1, 0)[:, None, None], out=sorteio)
+        amostra = np.take_along_axis(matriz[:, None, :], sorteio, axis=-1)
+        amostra *= np.arange(matriz.shape[1]) < quantidades[:, None, None]
+        del sorteio
+    elif modo == 'embaralhar':
+        # Os zeros de preenchimento embaralhados junto não alteram a curva
+        amostra = rng.permuted(np.broadcast_to(matriz[:, None, :], (len(quantidades), n, matriz.shape[1])), axis=-1)
+    else:
+        raise ValueError(f"Modo de Monte Carlo desconhecido: {modo}")
+    # Sem out=amostra: o acumulado sobre o próprio array vaza uma cópia dele a cada chamada (NumPy 2.3)
+    return np.cumsum(amostra, axis=-1)
+
+
+def trajetorias(retornos_por_estrategia, n=10000, modo='reamostrar', semente=None):
+    # Log do fator de patrimônio (0 = caixa inicial) após cada operação: estratégia × trajetória × operação
+    matriz, quantidades = _matriz_operacoes(retornos_por_estrategia)
+    return _trajetorias(matriz, quantidades, n, modo, np.random.default_rng(semente))
+
+
+def simular(retornos_por_estrategia, n=10000, modo='reamostrar', semente=None):
+    # Log do fator final e drawdown máximo (fração) de cada trajetória: duas matrizes estratégia × trajetória
+    matriz, quantidades = _matriz_operacoes(retornos_por_estrategia)
+    rng = np.random.default_rng(semente)
+    bloco = max(1, int(LIMITE_MB * 1024 ** 2 // (_BYTES_POR_PONTO * matriz.size)))
+    finais, drawdown = [], []
+    for inicio in range(0, n, bloco):
+        curvas = _trajetorias(matriz, quantidades, min(bloco, n - inicio), modo, rng)
+        finais.append(curvas[..., -1].astype(np.float64))
+        # O pico parte do caixa inicial: uma perda na primeira operação já é drawdown
+        pico = np.maximum.accumulate(curvas, axis=-1)
+        np.maximum(pico, 0.0, out=pico)
+        np.subtract(curvas, pico, out=curvas)
+        drawdown.append(1.0 - np.exp(curvas.min(axis=-1).astype(np.float64)))
+        # Libera o bloco antes de sortear o próximo
+        del curvas, pico
+    return np.concatenate(finais, axis=-1), np.concatenate(drawdown, axis=-1)
+
+
+def faixas(operacoes, n=10000, modo='reamostrar', percentis=PERCENTIS, semente=None):
+    # 'operacoes' = {estratégia: retornos das operações}; uma linha por estratégia, valores em %
+    nomes = list(operacoes)
+    retornos = [np.asarray(operacoes[nome], dtype='float64') for nome in nomes]
+    if not nomes:
+        return pd.DataFrame()
+    finais, drawdown = simular(retornos, n=n, modo=modo, semente=semente)
+    # Percentis no log (a ordem é a mesma); um fator acima do float64 aparece como infinito
+    with np.errstate(over='ignore'):
+        bandas_retorno = np.expm1(np.percentile(finais, percentis, axis=-1)) * 100
+    bandas_drawdown = np.percentile(drawdown, percentis, axis=-1) * 100
+
+    df = pd.DataFrame({'Estratégia': nomes, 'Operações': [len(r) for r in retornos]})
+    for p, valores in zip(percentis, bandas_retorno):
+        df[f'Retorno P{p} (%)'] = valores.round(2)
+    # Drawdown: o percentil alto é o cenário ruim
+    for p, valores in zip(percentis, bandas_drawdown):
+        df[f'Drawdown P{p} (%)'] = valores.round(2)
+    df['Prob. de perda (%)'] = ((finais < 0).mean(axis=-1) * 100).round(1)
+    return df
@@ -0,0 +1,49 @@
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# -------------------------
+# 🔩 Núcleos compilados para regras que dependem do caminho
+# -------------------------
+# Regras como "zera 5% abaixo do preço de entrada" não viram uma operação sobre
+# a série inteira: a saída depende de quando e a que preço se entrou. Essas
+# regras são escritas como um laço pregão a pregão sobre arrays NumPy e
+# compiladas pelo numba (código nativo, com o binário guardado em __pycache__
+# para os próximos processos). Sem o numba, o mesmo laço roda em Python puro:
+# o resultado é idêntico, só mais lento.
+#
+# Convenção de um núcleo: recebe 'entrada' (pregões em que a regra pode comprar;
+# o motor vetorizado desliga as compras que a corretora rejeitaria e chama o
+# núcleo de novo), as colunas de preço e os parâmetros, e devolve 'estado': True
+# nos pregões em que a decisão tomada no fechamento é estar comprado (executada
+# na abertura seguinte, como em vetorizado.estado_posicao).
+
+COMPILADO = njit is not None
+
+
+def compilar(funcao):
+    return njit(cache=True, nogil=True)(funcao) if COMPILADO else funcao
+
+
+@compilar
+def stop_alvo(entrada, fechamento, stop, alvo):
+    # StrategyMomentumTrailing: compra no sinal guardando o fechamento como
+    # preço de entrada e zera quando o fechamento sai da faixa
+    # [entrada × (1 - stop), entrada × (1 + alvo)]
+    n = len(entrada)
+    estado = np.zeros(n, dtype=np.bool_)
+    comprado = False
+    preco_entrada = 0.0
+    for t in range(n):
+        # A ordem do pregão anterior já foi executada na abertura deste
+        if not comprado:
+            if entrada[t]:
+                comprado = True
+                preco_entrada = fechamento[t]
+        elif fechamento[t] < preco_entrada * (1.0 - stop) or fechamento[t] > preco_entrada * (1.0 + alvo):
+            comprado = False
+        estado[t] = comprado
+    return estado
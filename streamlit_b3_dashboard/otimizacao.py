@@ -0,0 +1,147 @@
+import itertools
+import random
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from registro import validar
+
+# -------------------------
+# 🔧 Otimização de parâmetros
+# -------------------------
+# Varre combinações de parâmetros (grade completa ou amostra aleatória) de uma
+# estratégia sobre os ativos escolhidos. Cada par (ativo, combinação) vira um job
+# de execucao.py; os jobs saem agrupados por ativo, de modo que cada worker
+# reaproveita os indicadores já calculados (SMA(20) de PETR4 serve a todas as
+# combinações que a usam) e os preços carregados uma única vez.
+
+ESPACOS = {
+    "StrategySMACross": {
+        'fast': list(range(5, 55, 5)),
+        'slow': list(range(20, 210, 10)),
+    },
+    "EstrategiaMediaCruzada": {
+        'periodo_curto': list(range(5, 55, 5)),
+        'periodo_longo': list(range(20, 210, 10)),
+    },
+    "StrategyMovingAverageVolatility": {
+        'fast': [5, 10, 15, 20, 30],
+        'slow': [20, 30, 50, 100, 200],
+        'vol_window': [10, 20, 30],
+        'vol_threshold': [0.01, 0.02, 0.03, 0.05, 0.08],
+    },
+    "StrategyMomentumTrailing": {
+        'momentum_period': [5, 10, 15, 20, 30],
+        'stop_loss': [0.02, 0.03, 0.05, 0.08, 0.10],
+        'take_profit': [0.05, 0.10, 0.15, 0.20, 0.30],
+    },
+}
+
+# Combinações sem sentido (média "rápida" mais lenta que a "lenta") ficam de fora
+RESTRICOES = {
+    "StrategySMACross": lambda c: c['fast'] < c['slow'],
+    "EstrategiaMediaCruzada": lambda c: c['periodo_curto'] < c['periodo_longo'],
+    "StrategyMovingAverageVolatility": lambda c: c['fast'] < c['slow'],
+}
+
+METRICAS_RANKING = ["Sharpe", "Retorno (%)"]
+
+
+def gerar_grade(estrategia, espaco=None):
+    espaco = espaco or ESPACOS[estrategia]
+    valida = RESTRICOES.get(estrategia, lambda c: True)
+    nomes = list(espaco)
+    combinacoes = (dict(zip(nomes, valores)) for valores in itertools.product(*espaco.values()))
+    return [c for c in combinacoes if valida(c)]
+
+
+def gerar_aleatorio(estrategia, n, semente=None, espaco=None):
+    # Amostra sem repetição da grade válida
+    grade = gerar_grade(estrategia, espaco)
+    return random.Random(semente).sample(grade, min(n, len(grade)))
+
+
+def montar_jobs(estrategia, combinacoes, ativos, motor='vetorizado', caixa=100000.0, comissao=0.001, percentual=95,
+                inicio=None):
+    return [
+        {'ativos': [ativo], 'estrategia': estrategia, 'params': combinacao, 'caixa': caixa,
+         'comissao': comissao, 'percentual': percentual, 'motor': motor, 'somente_metricas': True, 'inicio': inicio}
+        for ativo in ativos for combinacao in combinacoes
+    ]
+
+
+def ranking(combinacoes, ativos, resultados, metrica="Sharpe", caixa=100000.0):
+    # Média entre os ativos de cada combinação; aceita resultados parciais
+    # (None nos jobs ainda em execução), para exibir o ranking enquanto a varredura roda
+    n = len(combinacoes)
+    sharpe = np.full((len(ativos), n), np.nan)
+    retorno = np.full((len(ativos), n), np.nan)
+    drawdown = np.full((len(ativos), n), np.nan)
+    for i, r in enumerate(resultados):
+        if r is None or 'erro' in r:
+            continue
+        a, c = divmod(i, n)
+        sharpe[a, c] = np.nan if r['sharpe'] is None else r['sharpe']
+        retorno[a, c] = (r['valor_final'] - caixa) / caixa * 100
+        drawdown[a, c] = r['drawdown']
+
+    concluidos = ~np.isnan(retorno)
+    prontas = concluidos.any(axis=0)
+    if not prontas.any():
+        return pd.DataFrame()
+
+    # Colunas só com NaN (Sharpe indefinido em todos os ativos) geram avisos inofensivos
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        df = pd.DataFrame(combinacoes)[prontas].reset_index(drop=True)
+        df["Sharpe"] = np.round(np.nanmean(sharpe, axis=0)[prontas], 3)
+        df["Retorno (%)"] = np.round(np.nanmean(retorno, axis=0)[prontas], 2)
+        df["Drawdown máx. (%)"] = np.round(np.nanmax(drawdown, axis=0)[prontas], 2)
+    df["Ativos"] = concluidos.sum(axis=0)[prontas]
+    return df.sort_values(metrica, ascending=False, na_position='last').reset_index(drop=True)
+
+
+def falhas(combinacoes, ativos, resultados):
+    # Pares (ativo, combinação) que ficaram fora do ranking: barrados na validação ou com erro no worker
+    n = len(combinacoes)
+    linhas = []
+    for i, r in enumerate(resultados):
+        if r is not None and 'erro' in r:
+            a, c = divmod(i, n)
+            linhas.append({'Ativo': ativos[a], **combinacoes[c], 'Erro': r['erro']})
+    return pd.DataFrame(linhas, columns=['Ativo', *(combinacoes[0] if combinacoes else []), 'Erro'])
+
+
+def otimizar(precos, estrategia, combinacoes, ativos, motor='vetorizado', processos=None, ao_concluir=None, metrica="Sharpe",
+             inicio=None):
+    # 'ao_concluir(concluidos, total, resultados)' recebe a lista parcial de
+    # resultados a cada job terminado; use ranking() sobre ela para mostrar os líderes.
+    # Com 'inicio', os preços trazem o aquecimento da combinação mais longa e
+    # todas as combinações operam (e são medidas) a partir da mesma data.
+    # Devolve (ranking, falhas): as combinações barradas ou com erro em cada ativo
+    from execucao import executar_em_paralelo  # carrega o backtrader: só quando a varredura roda
+    jobs = montar_jobs(estrategia, combinacoes, ativos, motor=motor, inicio=inicio)
+    resultados = [None] * len(jobs)
+
+    # Validação antes de disparar: um aquecimento maior que os pregões do ativo
+    # quebra no Cerebro e sairia como 0% no motor vetorizado; nos dois motores o
+    # par fica fora do ranking e aparece nas falhas
+    validos = []
+    for i, job in enumerate(jobs):
+        problemas = validar(estrategia, precos[job['ativos'][0]], job['params'])
+        if problemas:
+            resultados[i] = {'erro': '; '.join(problemas)}
+        else:
+            validos.append(i)
+    concluidos = [i for i, r in enumerate(resultados) if r is not None]
+
+    def registrar(k, resultado):
+        i = validos[k]
+        resultados[i] = resultado
+        concluidos.append(i)
+        if ao_concluir:
+            ao_concluir(len(concluidos), len(jobs), resultados)
+
+    executar_em_paralelo(precos, [jobs[i] for i in validos], processos=processos, ao_concluir=registrar)
+    return ranking(combinacoes, ativos, resultados, metrica=metrica), falhas(combinacoes, ativos, resultados)
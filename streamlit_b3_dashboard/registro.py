@@ -0,0 +1,121 @@
+import importlib
+
+# -------------------------
+# 📚 Registro das estratégias
+# -------------------------
+# Cada estratégia é declarada uma única vez, com o rótulo exibido no app, os
+# parâmetros (e valores padrão), as colunas de preço de que precisa, o
+# aquecimento (pregões consumidos pelos indicadores antes do primeiro next()) e
+# se há regra equivalente no motor vetorizado. A classe do backtrader só é
+# importada quando um backtest de fato roda: o app monta a interface, valida
+# os pedidos e escolhe o motor de cada estratégia sem carregar o backtrader.
+
+# A ordem de compra/venda é executada na abertura do pregão seguinte
+_OHLC = ('Open', 'High', 'Low', 'Close')
+_OC = ('Open', 'Close')
+
+
+class DefinicaoEstrategia:
+    def __init__(self, nome, rotulo, aquecimento, params=None, colunas=_OC, vetorizado=False, modulo='estrategias'):
+        self.nome = nome
+        self.rotulo = rotulo
+        self.params = dict(params or {})
+        self.colunas = tuple(colunas)
+        self.vetorizado = vetorizado
+        self.modulo = modulo
+        # 'aquecimento' recebe os parâmetros completos (padrões + informados)
+        self._aquecimento = aquecimento
+
+    def classe(self):
+        return getattr(importlib.import_module(self.modulo), self.nome)
+
+    def parametros(self, params=None):
+        desconhecidos = set(params or {}) - set(self.params)
+        if desconhecidos:
+            raise ValueError(f"{self.nome} não tem o(s) parâmetro(s) {', '.join(sorted(desconhecidos))}")
+        return {**self.params, **(params or {})}
+
+    def aquecimento(self, params=None):
+        return self._aquecimento(self.parametros(params))
+
+
+REGISTRO = {}
+
+
+def registrar(nome, rotulo, aquecimento, params=None, colunas=_OC, vetorizado=False, modulo='estrategias'):
+    if nome in REGISTRO:
+        raise ValueError(f"Estratégia {nome} já registrada")
+    if any(d.rotulo == rotulo for d in REGISTRO.values()):
+        raise ValueError(f"Rótulo '{rotulo}' já usado por outra estratégia")
+    REGISTRO[nome] = DefinicaoEstrategia(nome, rotulo, aquecimento, params, colunas, vetorizado, modulo)
+    return REGISTRO[nome]
+
+
+registrar("StrategyStochasticSlow", "Stochastic Oscillator", lambda p: 17, colunas=_OHLC, vetorizado=True)
+registrar("StrategySMACross", "Cruzamento de Médias Simples", lambda p: max(p['fast'], p['slow']),
+          params={'fast': 10, 'slow': 30}, vetorizado=True)
+registrar("StrategyEMACross", "Cruzamento de Médias Exponenciais", lambda p: 26, vetorizado=True)
+registrar("StrategyBollinger", "Bandas de Bollinger", lambda p: 19, vetorizado=True)
+registrar("StrategyRSI", "Índice de Força Relativa (RSI)", lambda p: 14, vetorizado=True)
+registrar("StrategyMACD", "MACD", lambda p: 33, vetorizado=True)
+registrar("StrategyADX", "ADX + DI", lambda p: 27, colunas=_OHLC, vetorizado=True)
+registrar("StrategyMomentum", "Momentum", lambda p: 10, vetorizado=True)
+registrar("StrategyIchimoku", "Ichimoku Kinko Hyo", lambda p: 77, colunas=_OHLC, vetorizado=True)
+registrar("StrategyMARSI", "Moving Average & RSI", lambda p: 14, vetorizado=True)
+# PercentChange do backtrader compara com 30 pregões atrás
+registrar("StrategyMovingAverageVolatility", "Médias + Volatilidade",
+          lambda p: max(p['fast'], p['slow'], 30 + p['vol_window']) - 1,
+          params={'fast': 10, 'slow': 30, 'vol_window': 20, 'vol_threshold': 0.02}, vetorizado=True)
+registrar("StrategyMomentumTrailing", "Momentum com Stop/Alvo", lambda p: p['momentum_period'],
+          params={'momentum_period': 15, 'stop_loss': 0.05, 'take_profit': 0.10}, vetorizado=True)
+registrar("EstrategiaMediaCruzada", "Cruzamento Médias 20/50", lambda p: max(p['periodo_curto'], p['periodo_longo']) - 1,
+          params={'periodo_curto': 20, 'periodo_longo': 50})
+registrar("EstrategiaRSI", "RSI 30/70", lambda p: 14)
+registrar("EstrategiaBollinger", "Bollinger Bands", lambda p: 19)
+registrar("EstrategiaMACD", "MACD (cruzamento de sinal)", lambda p: 34)
+
+
+def obter(nome):
+    if nome not in REGISTRO:
+        raise ValueError(f"Estratégia desconhecida: {nome}")
+    return REGISTRO[nome]
+
+
+def carregar_classe(nome):
+    return obter(nome).classe()
+
+
+def rotulos():
+    # {rótulo exibido: nome da classe}, na ordem de registro
+    return {d.rotulo: nome for nome, d in REGISTRO.items()}
+
+
+def suporta_vetorizado(nome):
+    return obter(nome).vetorizado
+
+
+def motor_para(nome, motor):
+    # O motor pedido vale para as estratégias que o suportam; as demais ficam no Cerebro
+    return 'vetorizado' if motor == 'vetorizado' and suporta_vetorizado(nome) else 'backtrader'
+
+
+def validar(nome, df, params=None):
+    # Problemas que impedem um backtest útil, verificados antes de disparar os jobs
+    definicao = obter(nome)
+    try:
+        aquecimento = definicao.aquecimento(params)
+    except ValueError as e:
+        return [str(e)]
+    problemas = []
+    faltando = [coluna for coluna in definicao.colunas if coluna not in df.columns]
+    if faltando:
+        problemas.append(f"faltam as colunas {', '.join(faltando)}")
+    if len(df) <= aquecimento:
+        problemas.append(f"{len(df)} pregões não bastam para o aquecimento de {aquecimento}")
+    return problemas
+
+
+def aquecimento_maximo(pares):
+    # Maior aquecimento entre pares (nome, params): é o que se carrega antes do
+    # início do período quando várias estratégias dividem os mesmos preços
+    return max((obter(nome).aquecimento(params) for nome, params in pares), default=0)
@@ -0,0 +1,581 @@
+import streamlit as st
+import pandas as pd
+import os
+from datetime import date
+
+# As estratégias ficam em estrategias.py e são resolvidas pelo nome da classe nos workers
+from dados import atualizar_cache, carregar_universo, ESTATISTICAS_CACHE, FONTE, MODO_OFFLINE, PASTA_REPLAY
+from armazem import ARMAZEM_RESULTADOS
+from metricas import calcular_metricas, retornos_de_equity
+from registro import aquecimento_maximo, motor_para, rotulos, validar
+from otimizacao import ESPACOS, METRICAS_RANKING, gerar_aleatorio, gerar_grade, otimizar, ranking
+from cache_indicadores import CACHE_INDICADORES
+from graficos import PONTOS_TELA, reduzir_curva
+from matriz import limpar_matrizes, matriz_universo, remover_matriz
+from desempenho import Medidor, encerrar_perfil, iniciar_perfil
+from walkforward import MODOS, walk_forward
+import montecarlo
+from triagem import ACOES_IBOV, ORDEM_RANKING, estrategias_rapidas, ler_lista_ativos, ordenar, triagem
+
+st.set_page_config(page_title="Backtesting B3", layout="wide")
+st.title("📈 Backtesting de Estratégias Quantitativas - B3")
+
+# -------------------------
+# 🗃️ Cache entre reexecuções do script
+# -------------------------
+# Qualquer widget alterado reexecuta o script inteiro; preços e resultados de
+# backtest ficam memorizados (chave: ativos, datas, estratégia e parâmetros dos
+# jobs) para que filtrar ou replotar resultados existentes seja imediato.
+TTL_CACHE = int(os.environ.get("B3_TTL_CACHE", "3600"))
+
+# Nomes das funções memorizadas que de fato executaram nesta reexecução; as
+# ausentes foram servidas pelo cache do Streamlit (usado no painel de desempenho)
+EXECUTADAS = []
+
+
+@st.cache_data(ttl=TTL_CACHE, show_spinner="Carregando preços...")
+def carregar_precos_cache(ativos, data_inicio, data_fim, offline, aquecimento=0):
+    EXECUTADAS.append("carregar_precos_cache")
+    # 'aquecimento' pregões antes de data_inicio, para as estratégias já operarem no primeiro dia do período
+    return carregar_universo(list(ativos), data_inicio, data_fim, offline=offline, aquecimento=aquecimento)
+
+
+# Os elementos de progresso são criados dentro das funções memorizadas: o
+# Streamlit só consegue repetir, num acerto de cache, elementos criados ali dentro.
+# O número de processos não muda o resultado e fica fora da chave (prefixo _), assim
+# como o armazém em disco (armazem.py), de onde saem os pares já calculados em outras execuções.
+
+@st.cache_data(ttl=TTL_CACHE, show_spinner=False)
+def executar_backtests_cache(ativos, data_inicio, data_fim, offline, aquecimento, jobs, _processos=None,
+                             _armazem=ARMAZEM_RESULTADOS):
+    EXECUTADAS.append("executar_backtests_cache")
+    from execucao import executar_em_paralelo  # carrega o backtrader: só quando um backtest roda
+    precos = carregar_precos_cache(ativos, data_inicio, data_fim, offline, aquecimento)
+
+    progresso = st.progress(0.0, text="Executando backtests...")
+    concluidos = []
+    def atualizar_progresso(i, resultado):
+        concluidos.append(i)
+        progresso.progress(len(concluidos) / len(jobs), text=f"Backtests concluídos: {len(concluidos)}/{len(jobs)}")
+
+    resultados = executar_em_paralelo(precos, jobs, processos=_processos, ao_concluir=atualizar_progresso,
+                                      armazem=_armazem)
+    progresso.empty()
+    return resultados
+
+
+# Gráfico candlestick do Cerebro, só quando pedido: os backtests rodam sem desenhar
+# nada e a imagem fica memorizada pela chave do resultado (preços + estratégia + conta)
+@st.cache_data(ttl=TTL_CACHE, show_spinner="Desenhando o gráfico...")
+def grafico_cache(ativos, data_inicio, data_fim, offline, aquecimento, estrategia, caixa, comissao, percentual):
+    EXECUTADAS.append("grafico_cache")
+    from execucao import executar_cerebro
+    precos = carregar_precos_cache(ativos, data_inicio, data_fim, offline, aquecimento)
+    quadros = [(ativo, precos[ativo]) for ativo in ativos]
+    return executar_cerebro(quadros, estrategia, caixa=caixa, comissao=comissao, percentual=percentual,
+                            grafico=True, inicio=data_inicio)['grafico']
+
+
+# Cada curva é reduzida uma vez por resultado: ao incluir um ativo ou uma
+# estratégia, só as séries novas são processadas (as curvas ficam fora da chave)
+@st.cache_data(ttl=TTL_CACHE, show_spinner=False)
+def curva_reduzida_cache(chave_resultado, pontos, _datas, _equity):
+    return reduzir_curva(_datas, _equity, pontos)
+
+
+# Monte Carlo das operações de cada carteira: recalculado só quando o resultado,
+# o número de trajetórias ou o modo mudam (as operações ficam fora da chave)
+@st.cache_data(ttl=TTL_CACHE, show_spinner=False)
+def montecarlo_cache(chave_resultado, trajetorias, modo, _operacoes):
+    return montecarlo.faixas(_operacoes, n=trajetorias, modo=modo, semente=0)
+
+
+@st.cache_data(ttl=TTL_CACHE, show_spinner=False)
+def otimizar_cache(ativos, data_inicio, data_fim, offline, estrategia, combinacoes, motor, metrica, _processos=None):
+    aquecimento = aquecimento_maximo((estrategia, combinacao) for combinacao in combinacoes)
+    precos = carregar_precos_cache(ativos, data_inicio, data_fim, offline, aquecimento)
+
+    # Resultados parciais: o ranking é atualizado enquanto os jobs terminam
+    progresso = st.progress(0.0, text="Otimizando...")
+    parcial = st.empty()
+    passo = max(1, len(combinacoes) * len(ativos) // 20)
+    def mostrar_parcial(concluidos, total, resultados):
+        progresso.progress(concluidos / total, text=f"Backtests concluídos: {concluidos}/{total}")
+        if concluidos % passo == 0 and concluidos < total:
+            parcial.dataframe(ranking(combinacoes, ativos, resultados, metrica=metrica).head(20))
+
+    resultado = otimizar(precos, estrategia, combinacoes, list(ativos), motor=motor, processos=_processos,
+                         ao_concluir=mostrar_parcial, metrica=metrica, inicio=data_inicio)
+    progresso.empty()
+    parcial.empty()
+    return resultado
+
+
+@st.cache_data(ttl=TTL_CACHE, show_spinner=False)
+def walkforward_cache(ativos, data_inicio, data_fim, offline, estrategia, combinacoes, motor, metrica, treino, teste,
+                      ancorada, _processos=None):
+    aquecimento = aquecimento_maximo((estrategia, combinacao) for combinacao in combinacoes)
+    precos = carregar_precos_cache(ativos, data_inicio, data_fim, offline, aquecimento)
+
+    progresso = st.progress(0.0, text="Walk-forward em andamento...")
+    def atualizar_progresso(concluidos, total):
+        progresso.progress(concluidos / total, text=f"Backtests concluídos: {concluidos}/{total}")
+
+    resultado = walk_forward(precos, estrategia, combinacoes, list(ativos), treino, teste, ancorada=ancorada,
+                             motor=motor, processos=_processos, ao_concluir=atualizar_progresso, metrica=metrica,
+                             inicio=data_inicio)
+    progresso.empty()
+    return resultado
+
+
+@st.cache_data(ttl=TTL_CACHE, show_spinner=False)
+def triagem_cache(ativos, data_inicio, data_fim, offline, estrategias_triagem, _processos=None):
+    aquecimento = aquecimento_maximo((classe, None) for classe in estrategias_triagem.values())
+    precos = carregar_precos_cache(ativos, data_inicio, data_fim, offline, aquecimento)
+    # O universo vai para os workers como uma matriz em disco (mmap), sem uma cópia dos quadros por processo
+    # (o ranking é que fica no cache: a matriz é apagada ao fim da triagem)
+    precos = matriz_universo(precos, (ativos, data_inicio, data_fim, offline, aquecimento))
+
+    progresso = st.progress(0.0, text="Triagem em andamento...")
+    def atualizar_progresso(concluidos, total):
+        progresso.progress(concluidos / total, text=f"Ativos concluídos: {concluidos}/{total}")
+
+    try:
+        df = triagem(precos, estrategias_triagem, processos=_processos, ao_concluir=atualizar_progresso,
+                     inicio=data_inicio)
+    finally:
+        remover_matriz(precos)
+    progresso.empty()
+    return df
+
+
+def limpar_caches():
+    carregar_precos_cache.clear()
+    executar_backtests_cache.clear()
+    grafico_cache.clear()
+    curva_reduzida_cache.clear()
+    montecarlo_cache.clear()
+    otimizar_cache.clear()
+    walkforward_cache.clear()
+    triagem_cache.clear()
+    CACHE_INDICADORES.limpar()
+    limpar_matrizes()
+
+TICKERS_B3 = sorted([
+    "PETR4.SA", "VALE3.SA", "ITUB4.SA", "BBDC4.SA", "ABEV3.SA",
+    "WEGE3.SA", "BBAS3.SA", "RENT3.SA", "MGLU3.SA", "ELET3.SA",
+    "B3SA3.SA", "CSNA3.SA", "SUZB3.SA", "PRIO3.SA", "RAIZ4.SA",
+    "GGBR4.SA", "KLBN11.SA", "LREN3.SA", "BRFS3.SA", "EMBR3.SA"
+])
+
+# Seleciona os ativos que serão utilizados no backtest
+ativos = st.multiselect("Selecione até 3 ativos da B3:", TICKERS_B3, max_selections=3)
+
+col1, col2 = st.columns(2)
+with col1:
+# Define o período de início e fim para o backtest
+    data_inicio = st.date_input("Data inicial", value=date(2022, 1, 1))
+with col2:
+    data_fim = st.date_input("Data final", value=date.today())
+
+# Rótulo exibido -> nome da classe, na ordem do registro (registro.py); as
+# classes do backtrader só são importadas quando um backtest roda
+estrategias = rotulos()
+
+# Permite ao usuário escolher até 10 estratégias para serem testadas
+estrategias_selecionadas = st.multiselect("Escolha até 10 estratégias:", list(estrategias.keys()), max_selections=10)
+
+# Sem internet, os backtests usam apenas os preços já salvos no cache local
+offline = st.checkbox("📴 Modo offline (usar somente o cache local)", value=MODO_OFFLINE)
+# A fonte é escolhida pela variável B3_FONTE (dados.py); o replay não depende de rede
+if FONTE == "arquivos":
+    st.caption(f"Fonte de preços: arquivos de replay em {PASTA_REPLAY}")
+
+# O motor vetorizado reproduz as estratégias sobre a série inteira, sem o loop bar a bar do Cerebro
+motor = st.radio("⚙️ Motor de backtest:", ["Backtrader (Cerebro)", "Vetorizado (NumPy)"], horizontal=True)
+sem_vetorizado = [nome for nome in estrategias_selecionadas if motor_para(estrategias[nome], 'vetorizado') != 'vetorizado']
+if motor == "Vetorizado (NumPy)" and sem_vetorizado:
+    st.caption("Sem versão vetorizada, rodam no Cerebro: " + ", ".join(sem_vetorizado))
+
+# Os backtests independentes são distribuídos entre os núcleos da máquina
+processos = st.number_input("🧵 Processos em paralelo:", min_value=1, max_value=os.cpu_count() or 1, value=os.cpu_count() or 1)
+# Perfil de uma única execução: tudo roda neste processo e sem os caches, para aparecer no cProfile
+perfilar = st.checkbox("🧪 Gerar perfil cProfile da próxima execução")
+executar = st.button("🚀 Executar Backtest")
+
+col_atualizar, col_limpar = st.columns(2)
+with col_atualizar:
+    # Atualização incremental: estende até hoje os ativos já salvos, baixando só os pregões que faltam
+    if st.button("🔄 Atualizar cache de preços", disabled=offline):
+        st.dataframe(atualizar_cache())
+        limpar_caches()
+with col_limpar:
+    total_armazem, mb_armazem = ARMAZEM_RESULTADOS.resumo()
+    if st.button("🧹 Invalidar resultados memorizados",
+                 help=f"Inclui os {total_armazem} resultados gravados em disco ({mb_armazem:.1f} MB)."):
+        limpar_caches()
+        ARMAZEM_RESULTADOS.limpar()
+        st.session_state.pop("execucao", None)
+        st.session_state.pop("otimizacao", None)
+        st.session_state.pop("walkforward", None)
+        st.session_state.pop("triagem", None)
+
+# A execução fica registrada na sessão: os resultados continuam na tela (vindos
+# do cache) quando outro widget é alterado, até um novo clique em Executar
+if executar and ativos:
+    st.session_state["execucao"] = {
+        'ativos': tuple(ativo if ativo.endswith(".SA") else ativo + ".SA" for ativo in ativos),
+        'data_inicio': data_inicio,
+        'data_fim': data_fim,
+        'estrategias': list(estrategias_selecionadas),
+        'motor': motor,
+        'offline': offline,
+    }
+execucao = st.session_state.get("execucao")
+
+# Medição por etapa da execução exibida (painel "Desempenho da execução", no fim da página)
+medidor_app = Medidor()
+contagem_precos = lambda: (ESTATISTICAS_CACHE['acertos'], ESTATISTICAS_CACHE['faltas'])
+contagem_resultados = lambda: (ARMAZEM_RESULTADOS.acertos, ARMAZEM_RESULTADOS.faltas)
+
+def incorporar_workers(resultados_jobs, rotulos, executou):
+    # Etapas medidas nos workers; numa reexecução servida pelo cache são as da execução original
+    origem = None if executou else "worker (memorizado)"
+    for rotulo, r in zip(rotulos, resultados_jobs):
+        medidor_app.incorporar(r.get('desempenho'), prefixo=rotulo, origem=origem)
+
+profiler = None
+processos_exec = processos
+armazem_exec = ARMAZEM_RESULTADOS
+if executar and perfilar and execucao:
+    limpar_caches()
+    processos_exec = 1
+    armazem_exec = None
+    profiler = iniciar_perfil()
+
+if execucao:
+    resultados = []
+    curvas = []
+
+    ativos_exec = execucao['ativos']
+    estrategias_exec = execucao['estrategias']
+    # Os preços começam antes de data_inicio o bastante para a estratégia de maior
+    # aquecimento; todas operam e são medidas a partir de data_inicio
+    aquecimento_exec = aquecimento_maximo((estrategias[nome], None) for nome in estrategias_exec)
+    chave_precos = (ativos_exec, execucao['data_inicio'], execucao['data_fim'], execucao['offline'], aquecimento_exec)
+
+    # Dados históricos de todos os ativos lidos do cache local; o que faltar vem do Yahoo em um único pedido
+    with medidor_app.etapa("preços (cache local / fonte)", cache=contagem_precos) as etapa:
+        precos = carregar_precos_cache(*chave_precos)
+        etapa['Memorizado'] = "carregar_precos_cache" not in EXECUTADAS
+
+    ativos_validos = []
+    for ativo in ativos_exec:
+        if precos[ativo].empty or precos[ativo].index[-1] < pd.Timestamp(execucao['data_inicio']):
+            st.warning(f"⚠️ Nenhum dado encontrado para o ativo {ativo}.")
+            continue
+        ativos_validos.append(ativo)
+
+    # Um job por ativo: o feed é carregado uma vez e todas as estratégias passam
+    # por ele, cada uma com sua própria conta; os ativos rodam em paralelo
+    # Validação antes de disparar os jobs: colunas de preço e pregões suficientes para o aquecimento
+    estrategias_por_ativo = {}
+    for ativo in ativos_validos:
+        estrategias_por_ativo[ativo] = []
+        for estrategia_nome in estrategias_exec:
+            problemas = validar(estrategias[estrategia_nome], precos[ativo])
+            if problemas:
+                st.warning(f"⚠️ {estrategia_nome} ignorada em {ativo}: {'; '.join(problemas)}.")
+            else:
+                estrategias_por_ativo[ativo].append(estrategia_nome)
+    ativos_jobs = [ativo for ativo in ativos_validos if estrategias_por_ativo[ativo]]
+
+    motor_job = 'vetorizado' if execucao['motor'] == "Vetorizado (NumPy)" else 'backtrader'
+    jobs = [
+        {'ativos': [ativo], 'estrategias': [estrategias[nome] for nome in estrategias_por_ativo[ativo]],
+         'caixa': 10000, 'motor': motor_job, 'medir': True, 'inicio': execucao['data_inicio']}
+        for ativo in ativos_jobs
+    ]
+
+    EXECUTADAS.clear()
+    with medidor_app.etapa("backtests por ativo", cache=contagem_resultados) as etapa:
+        resultados_ativos = executar_backtests_cache(*chave_precos, jobs, _processos=processos_exec,
+                                                     _armazem=armazem_exec)
+        etapa['Memorizado'] = "executar_backtests_cache" not in EXECUTADAS
+    incorporar_workers(resultados_ativos, ativos_jobs, not etapa['Memorizado'])
+
+    for ativo, r in zip(ativos_jobs, resultados_ativos):
+        if 'erro' in r:
+            st.error(f"Erro ao processar o ativo {ativo}: {r['erro']}")
+            continue
+
+        for estrategia_nome, r_estrategia in zip(estrategias_por_ativo[ativo], r['estrategias']):
+            equity = r_estrategia['equity']
+            chave_resultado = (ativo, *chave_precos[1:], estrategia_nome, motor_job)
+            curva = curva_reduzida_cache(chave_resultado, PONTOS_TELA, r_estrategia['datas'], equity)
+            curvas.append(curva.assign(Série=f"{ativo} - {estrategia_nome}"))
+
+            resultados.append({
+                'Ação': ativo,
+                'Estratégia': estrategia_nome,
+                'Retorno Total (R$)': round(equity[-1] - 10000, 2),
+                'Sharpe': round(r_estrategia['sharpe'] or 0, 2),
+                'Drawdown (%)': round(r_estrategia['drawdown'], 2)
+            })
+
+    if resultados:
+        # Gráfico interativo (zoom, passar o mouse) com no máximo PONTOS_TELA pontos por curva
+        with medidor_app.etapa("gráfico de patrimônio (reduzido)"):
+            st.line_chart(pd.concat(curvas, ignore_index=True), x='Data', y='Patrimônio (R$)', color='Série')
+        df_result = pd.DataFrame(resultados)
+        st.dataframe(df_result)
+
+
+# -------------------------
+# 📥 Exportar Resultados
+# -------------------------
+
+import io
+
+# DataFrame para guardar resultados
+resultados_lista = []
+
+# Novo loop com coleta de KPIs
+# Loop principal que executa o backtest para cada estratégia selecionada
+if execucao:
+    # Uma carteira por estratégia com todos os ativos, todas sobre os mesmos feeds
+    # (só as estratégias válidas em todos eles)
+    estrategias_carteira = [nome for nome in estrategias_exec if all(nome in estrategias_por_ativo[a] for a in ativos_validos)]
+    classes_carteira = [estrategias[nome] for nome in estrategias_carteira]
+    job_kpi = {'ativos': ativos_validos, 'estrategias': classes_carteira, 'caixa': 100000.0,
+               'comissao': 0.001, 'percentual': 95, 'motor': motor_job, 'medir': True, 'inicio': execucao['data_inicio']}
+    resultado_kpi = {'estrategias': []}
+    if ativos_validos and classes_carteira:
+        EXECUTADAS.clear()
+        with medidor_app.etapa("carteiras por estratégia (KPIs)", cache=contagem_resultados) as etapa:
+            resultado_kpi = executar_backtests_cache(*chave_precos, [job_kpi], _processos=processos_exec,
+                                                     _armazem=armazem_exec)[0]
+            etapa['Memorizado'] = "executar_backtests_cache" not in EXECUTADAS
+        incorporar_workers([resultado_kpi], ["carteira"], not etapa['Memorizado'])
+    if 'erro' in resultado_kpi:
+        st.error(f"Erro ao executar as estratégias: {resultado_kpi['erro']}")
+        resultado_kpi = {'estrategias': []}
+
+    for estrategia_nome, classe, resultado in zip(estrategias_carteira, classes_carteira, resultado_kpi['estrategias']):
+        st.subheader(f"🔍 Estratégia: {estrategia_nome}")
+
+        valor_final = resultado['valor_final']
+        retorno = (valor_final - 100000) / 100000
+
+        resultados_lista.append({
+            "Estratégia": estrategia_nome,
+            "Retorno (%)": round(retorno * 100, 2),
+            "Valor Final (R$)": round(valor_final, 2),
+        })
+
+        st.write(f"Valor final da carteira: R$ {valor_final:,.2f}")
+        # Gráfico da simulação sob demanda: desenhar o candlestick com todos os indicadores
+        # costuma levar mais que o próprio backtest
+        if st.checkbox("📈 Mostrar gráfico candlestick", key=f"grafico_{estrategia_nome}"):
+            EXECUTADAS.clear()
+            with medidor_app.etapa(f"gráfico {classe} (matplotlib)") as etapa:
+                st.image(grafico_cache(tuple(ativos_validos), *chave_precos[1:], classe,
+                                       job_kpi['caixa'], job_kpi['comissao'], job_kpi['percentual']))
+                etapa['Memorizado'] = "grafico_cache" not in EXECUTADAS
+
+# Converter para DataFrame
+# Cria um DataFrame com os resultados agregados de retorno final
+df_resultados = pd.DataFrame(resultados_lista)
+
+if not df_resultados.empty:
+    # Filtros adicionais
+    with st.expander("🔍 Filtros de Desempenho"):
+        min_retorno = st.slider("Retorno mínimo (%)", min_value=-100, max_value=500, value=-100)
+        df_filtrado = df_resultados[df_resultados["Retorno (%)"] >= min_retorno]
+
+        st.dataframe(df_filtrado)
+
+    # Gráfico de barras comparativo
+    st.subheader("📊 Comparação de Retorno entre Estratégias")
+    st.bar_chart(df_filtrado.set_index("Estratégia")["Retorno (%)"])
+
+    # Botão para download CSV
+    csv_buffer = io.StringIO()
+    df_resultados.to_csv(csv_buffer, index=False)
+    st.download_button(
+        label="📥 Baixar resultados em CSV",
+        data=csv_buffer.getvalue(),
+        file_name="resultados_backtest.csv",
+        mime="text/csv"
+    )
+
+
+# -------------------------
+# 📊 Métricas de Performance
+# -------------------------
+# Coletar e exibir as métricas ao final
+metricas_lista = []
+
+if execucao:
+    # Métricas da própria curva de patrimônio de cada carteira (bloco de KPIs acima),
+    # sem outra passada do Cerebro nem novos downloads
+    with medidor_app.etapa("métricas de performance"):
+        for estrategia_nome, resultado in zip(estrategias_carteira, resultado_kpi['estrategias']):
+            ret_total, vol, sharpe, dd = calcular_metricas(retornos_de_equity(resultado['equity']))
+
+            metricas_lista.append({
+                "Estratégia": estrategia_nome,
+                "Retorno (%)": ret_total,
+                "Volatilidade (%)": vol,
+                "Sharpe": sharpe,
+                "Drawdown (%)": dd
+            })
+
+# Cria um DataFrame com métricas como retorno, volatilidade, Sharpe e drawdown
+df_metricas = pd.DataFrame(metricas_lista)
+st.subheader("📋 Métricas de Performance")
+st.dataframe(df_metricas)
+
+# -------------------------
+# 🎲 Robustez (Monte Carlo)
+# -------------------------
+if execucao and resultado_kpi['estrategias']:
+    with st.expander("🎲 Robustez das carteiras (Monte Carlo das operações)"):
+        col_n, col_modo = st.columns(2)
+        with col_n:
+            n_trajetorias = st.number_input("Trajetórias:", min_value=100, max_value=100000, value=10000, step=1000)
+        with col_modo:
+            modo_mc = st.radio("Sorteio:", list(montecarlo.MODOS), horizontal=True)
+        operacoes = {nome: r['operacoes'].to_numpy() for nome, r in zip(estrategias_carteira, resultado_kpi['estrategias'])}
+        with medidor_app.etapa("Monte Carlo das operações"):
+            df_mc = montecarlo_cache((*chave_precos, tuple(classes_carteira)), int(n_trajetorias),
+                                     montecarlo.MODOS[modo_mc], operacoes)
+        st.caption("Percentis do retorno final e do drawdown máximo sobre o caixa inicial, com as operações "
+                   "encerradas de cada carteira sorteadas novamente em cada trajetória.")
+        st.dataframe(df_mc, use_container_width=True)
+
+if profiler is not None:
+    st.session_state["perfil"] = encerrar_perfil(profiler)
+
+# -------------------------
+# ⏱️ Desempenho da execução
+# -------------------------
+if execucao:
+    with st.expander("⏱️ Desempenho da execução"):
+        st.caption("Tempo de parede e de CPU, pico de memória residente durante a etapa e acertos/faltas de cache por etapa. "
+                   "Etapas 'memorizado' vieram do cache do Streamlit; as de worker repetem a medição da execução original.")
+        st.dataframe(pd.DataFrame(medidor_app.etapas), use_container_width=True)
+
+        if "perfil" in st.session_state:
+            st.markdown("**Perfil cProfile da última execução perfilada** (ordenado pelo tempo acumulado)")
+            st.code(st.session_state["perfil"]['relatorio'], language=None)
+            st.download_button("📥 Baixar perfil (.prof)", st.session_state["perfil"]['dump'],
+                               file_name="backtest.prof", mime="application/octet-stream")
+
+
+
+# -------------------------
+# 🔧 Otimização de Parâmetros
+# -------------------------
+st.subheader("🔧 Otimização de Parâmetros")
+with st.expander("Varredura de parâmetros das estratégias"):
+    nomes_otimizaveis = [nome for nome, classe in estrategias.items() if classe in ESPACOS]
+    estrategia_otim = st.selectbox("Estratégia:", nomes_otimizaveis)
+    classe_otim = estrategias[estrategia_otim]
+    grade = gerar_grade(classe_otim)
+    st.caption(", ".join(f"{p}: {v[0]}…{v[-1]}" for p, v in ESPACOS[classe_otim].items()) + f" — {len(grade)} combinações válidas")
+
+    col_modo, col_n, col_rank = st.columns(3)
+    with col_modo:
+        modo_otim = st.radio("Busca:", ["Grade completa", "Aleatória"], horizontal=True)
+    with col_n:
+        n_aleatorio = st.number_input("Combinações sorteadas:", min_value=1, max_value=len(grade), value=min(200, len(grade)), disabled=modo_otim != "Aleatória")
+    with col_rank:
+        metrica_otim = st.selectbox("Ordenar por:", METRICAS_RANKING)
+
+    # Walk-forward: escolhe os parâmetros em cada janela de treino e mede só na janela de teste seguinte
+    periodo_otim = st.radio("Período:", ["Período inteiro", "Walk-forward"], horizontal=True)
+    col_treino, col_teste, col_janela = st.columns(3)
+    with col_treino:
+        janela_treino = st.number_input("Janela de treino (pregões):", min_value=20, value=504, step=21,
+                                        disabled=periodo_otim != "Walk-forward")
+    with col_teste:
+        janela_teste = st.number_input("Janela de teste (pregões):", min_value=5, value=126, step=21,
+                                       disabled=periodo_otim != "Walk-forward")
+    with col_janela:
+        modo_janela = st.radio("Janela de treino:", list(MODOS), horizontal=True, disabled=periodo_otim != "Walk-forward")
+
+    if st.button("🔧 Otimizar", disabled=not ativos):
+        ativos_otim = tuple(ativo if ativo.endswith(".SA") else ativo + ".SA" for ativo in ativos)
+        precos_otim = carregar_precos_cache(ativos_otim, data_inicio, data_fim, offline)
+        ativos_otim = tuple(ativo for ativo in ativos_otim if not precos_otim[ativo].empty)
+        combinacoes = grade if modo_otim == "Grade completa" else gerar_aleatorio(classe_otim, int(n_aleatorio))
+
+        motor_otim = 'vetorizado' if motor == "Vetorizado (NumPy)" else 'backtrader'
+        if periodo_otim == "Walk-forward":
+            janelas_wf, curva_wf = walkforward_cache(ativos_otim, data_inicio, data_fim, offline, classe_otim, combinacoes,
+                                                     motor_otim, metrica_otim, int(janela_treino), int(janela_teste),
+                                                     MODOS[modo_janela], _processos=processos)
+            st.session_state["walkforward"] = (estrategia_otim, modo_janela, janelas_wf, curva_wf)
+        else:
+            df_otim, falhas_otim = otimizar_cache(ativos_otim, data_inicio, data_fim, offline, classe_otim, combinacoes,
+                                                  motor_otim, metrica_otim, _processos=processos)
+            st.session_state["otimizacao"] = (estrategia_otim, classe_otim, metrica_otim, df_otim, falhas_otim)
+
+    # O último ranking continua visível nas reexecuções seguintes
+    if "otimizacao" in st.session_state:
+        estrategia_otim, classe_otim, metrica_otim, df_otim, falhas_otim = st.session_state["otimizacao"]
+        st.dataframe(df_otim)
+        if not falhas_otim.empty:
+            # Combinações sem pregões para o aquecimento ou com erro: fora da média de cada ativo
+            st.warning(f"⚠️ {len(falhas_otim)} pares (ativo, combinação) ficaram fora do ranking.")
+            with st.expander("Combinações ignoradas ou com erro"):
+                st.dataframe(falhas_otim, use_container_width=True)
+        if not df_otim.empty:
+            st.success(f"Melhor combinação de {estrategia_otim} por {metrica_otim}: " + ", ".join(f"{p}={df_otim.loc[0, p]}" for p in ESPACOS[classe_otim]))
+
+    if "walkforward" in st.session_state:
+        estrategia_wf, modo_wf, janelas_wf, curva_wf = st.session_state["walkforward"]
+        if janelas_wf.empty:
+            st.warning("O período não tem pregões suficientes para uma janela de treino e uma de teste.")
+        else:
+            st.markdown(f"**Walk-forward ({modo_wf.lower()}) de {estrategia_wf}**")
+            st.dataframe(janelas_wf, use_container_width=True)
+            if not curva_wf.empty:
+                # Só os trechos de teste, emendados: é o resultado que a otimização teria entregue na prática
+                st.caption("Patrimônio out-of-sample emendado (R$)")
+                st.line_chart(curva_wf)
+
+
+# -------------------------
+# 🏁 Triagem do Ibovespa
+# -------------------------
+st.subheader("🏁 Triagem do Ibovespa")
+with st.expander("Todas as estratégias sobre o universo inteiro, com ranking"):
+    # Sem o limite de 3 ativos: cada ativo roda todas as estratégias de uma vez, no motor mais rápido disponível
+    usar_ibov = st.checkbox(f"Incluir as {len(ACOES_IBOV)} ações do Ibovespa", value=True)
+    lista_extra = st.text_area("Outros ativos (códigos separados por vírgula, espaço ou linha):", "")
+    rapidas = estrategias_rapidas(estrategias)
+    estrategias_triagem = st.multiselect("Estratégias:", list(estrategias.keys()), default=list(rapidas.keys()),
+                                         help="As estratégias sem versão vetorizada rodam no Cerebro e deixam a triagem bem mais lenta.")
+    ativos_triagem = tuple(dict.fromkeys((ACOES_IBOV if usar_ibov else []) + ler_lista_ativos(lista_extra)))
+    st.caption(f"{len(ativos_triagem)} ativos × {len(estrategias_triagem)} estratégias")
+
+    if st.button("🏁 Rodar triagem", disabled=not (ativos_triagem and estrategias_triagem)):
+        df_triagem = triagem_cache(ativos_triagem, data_inicio, data_fim, offline,
+                                   {nome: estrategias[nome] for nome in estrategias_triagem}, _processos=processos)
+        st.session_state["triagem"] = df_triagem
+
+    if "triagem" in st.session_state:
+        df_triagem = st.session_state["triagem"]
+        col_ordem, col_visao = st.columns(2)
+        with col_ordem:
+            metrica_triagem = st.selectbox("Ordenar por:", list(ORDEM_RANKING), key="ordem_triagem")
+        with col_visao:
+            melhor_por_ativo = st.checkbox("Só a melhor estratégia de cada ativo")
+        ranking_triagem = ordenar(df_triagem, metrica_triagem)
+        if melhor_por_ativo:
+            ranking_triagem = ranking_triagem.drop_duplicates("Ativo").reset_index(drop=True)
+        st.dataframe(ranking_triagem, use_container_width=True)
+        st.download_button("📥 Baixar ranking em CSV", ranking_triagem.to_csv(index=False),
+                           file_name="triagem_ibovespa.csv", mime="text/csv")
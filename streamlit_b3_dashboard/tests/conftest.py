@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Os módulos do app são importados pelo nome (como no streamlit run, a partir da pasta do app)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
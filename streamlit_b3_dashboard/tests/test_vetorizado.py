@@ -0,0 +1,55 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from benchmark import preco_sintetico
+from execucao import executar_em_paralelo
+from registro import REGISTRO, suporta_vetorizado
+from vetorizado import sharpe_anual
+
+# -------------------------
+# ⚖️ Paridade do motor vetorizado com o Cerebro
+# -------------------------
+# Os dois motores devem produzir a mesma curva de patrimônio, o mesmo Sharpe e o
+# mesmo drawdown para toda estratégia com regra vetorizada, nos dois sizers
+# (lote fixo e percentual com comissão) e com ou sem os pregões de aquecimento
+# antes de 'inicio'. Preços sintéticos, sem rede.
+
+VETORIZADAS = [nome for nome in REGISTRO if suporta_vetorizado(nome)]
+CONTAS = {
+    'lote': {'caixa': 10000.0, 'comissao': 0.0, 'percentual': None},
+    'percentual': {'caixa': 100000.0, 'comissao': 0.001, 'percentual': 95},
+}
+
+
+@pytest.fixture(scope='module')
+def precos():
+    return {'SINT3.SA': preco_sintetico(7, '10a_diario')}
+
+
+@pytest.mark.parametrize('inicio', [None, date(2016, 3, 1)])
+@pytest.mark.parametrize('conta', list(CONTAS))
+def test_paridade_com_cerebro(precos, conta, inicio):
+    job = {'ativos': ['SINT3.SA'], 'estrategias': VETORIZADAS, 'inicio': inicio, **CONTAS[conta]}
+    vetorizado, cerebro = executar_em_paralelo(precos, [dict(job, motor='vetorizado'), dict(job, motor='backtrader')],
+                                               processos=1, armazem=None)
+    assert 'erro' not in vetorizado and 'erro' not in cerebro
+
+    for nome, v, b in zip(VETORIZADAS, vetorizado['estrategias'], cerebro['estrategias']):
+        assert len(v['equity']) == len(b['equity']), nome
+        assert (v['datas'] == b['datas']).all(), nome
+        np.testing.assert_allclose(v['equity'], b['equity'], rtol=1e-6, err_msg=nome)
+        assert v['drawdown'] == pytest.approx(b['drawdown'], abs=1e-6), nome
+        if b['sharpe'] is None:
+            assert v['sharpe'] is None, nome
+        else:
+            assert v['sharpe'] == pytest.approx(b['sharpe'], rel=1e-6, abs=1e-9), nome
+        assert len(v['operacoes']) == len(b['operacoes']), nome
+        np.testing.assert_allclose(v['operacoes'], b['operacoes'], rtol=1e-6, atol=1e-12, err_msg=nome)
+
+
+def test_sharpe_indefinido_sem_operacoes():
+    # Curva parada: o desvio é exatamente zero e o Sharpe fica indefinido, como no backtrader
+    datas = preco_sintetico(1, '10a_diario').index
+    assert sharpe_anual(datas, np.full(len(datas), 10000.0), 10000.0) is None
@@ -0,0 +1,110 @@
+import re
+
+import pandas as pd
+
+from registro import suporta_vetorizado, validar
+
+# -------------------------
+# 🏁 Triagem do universo Ibovespa
+# -------------------------
+# Roda as estratégias sobre todos os ativos de uma vez (um job por ativo, com
+# todas as estratégias sobre o mesmo feed) e monta um ranking. As estratégias
+# com regra vetorizada usam o motor NumPy; as demais passam pelo Cerebro com os
+# feeds compartilhados.
+
+# Mesma lista do streamlit_app_v2.py
+ACOES_IBOV = sorted([
+    'ABEV3.SA', 'ALPA4.SA', 'AMER3.SA', 'ASAI3.SA', 'AZUL4.SA', 'B3SA3.SA', 'BBAS3.SA',
+    'BBDC3.SA', 'BBDC4.SA', 'BBSE3.SA', 'BEEF3.SA', 'BPAC11.SA', 'BRAP4.SA', 'BRFS3.SA',
+    'BRKM5.SA', 'BRML3.SA', 'CASH3.SA', 'CCRO3.SA', 'CIEL3.SA', 'CMIG4.SA', 'COGN3.SA',
+    'CPFE3.SA', 'CPLE6.SA', 'CRFB3.SA', 'CSAN3.SA', 'CSNA3.SA', 'CVCB3.SA', 'CYRE3.SA',
+    'DXCO3.SA', 'ECOR3.SA', 'EGIE3.SA', 'ELET3.SA', 'ELET6.SA', 'EMBR3.SA', 'ENBR3.SA',
+    'ENEV3.SA', 'ENGI11.SA', 'EQTL3.SA', 'EZTC3.SA', 'GGBR4.SA', 'GOAU4.SA', 'GOLL4.SA',
+    'HAPV3.SA', 'HBOR3.SA', 'HYPE3.SA', 'IGTI11.SA', 'IRBR3.SA', 'ITSA4.SA', 'ITUB4.SA',
+    'JBSS3.SA', 'KLBN11.SA', 'LREN3.SA', 'LWSA3.SA', 'MGLU3.SA', 'MRFG3.SA', 'MRVE3.SA',
+    'MULT3.SA', 'NTCO3.SA', 'PETR3.SA', 'PETR4.SA', 'PRIO3.SA', 'QUAL3.SA', 'RADL3.SA',
+    'RAIL3.SA', 'RDOR3.SA', 'RENT3.SA', 'RRRP3.SA', 'SANB11.SA', 'SBSP3.SA', 'SLCE3.SA',
+    'SMTO3.SA', 'SULA11.SA', 'SUZB3.SA', 'TAEE11.SA', 'TIMS3.SA', 'TOTS3.SA', 'UGPA3.SA',
+    'USIM5.SA', 'VALE3.SA', 'VIVT3.SA', 'WEGE3.SA', 'YDUQ3.SA'
+])
+
+# Sentido de cada coluna do ranking (maior é melhor, exceto o drawdown)
+ORDEM_RANKING = {"Sharpe": False, "Retorno (%)": False, "Drawdown (%)": True}
+
+
+def ler_lista_ativos(texto):
+    # Aceita códigos separados por vírgula, espaço, ponto e vírgula ou quebra de
+    # linha, com ou sem o sufixo .SA; repetidos são descartados mantendo a ordem
+    ativos = []
+    for codigo in re.split(r"[\s,;]+", texto.upper()):
+        if not codigo:
+            continue
+        codigo = codigo if codigo.endswith(".SA") else codigo + ".SA"
+        if codigo not in ativos:
+            ativos.append(codigo)
+    return ativos
+
+
+def triagem(precos, estrategias, processos=None, ao_concluir=None, caixa=100000.0, comissao=0.001, percentual=95,
+            inicio=None):
+    # 'estrategias' = {rótulo: nome da classe}; devolve uma linha por (ativo, estratégia).
+    # Com 'inicio', as estratégias operam a partir dele (os pregões anteriores só aquecem os indicadores).
+    # 'ao_concluir(concluidos, total)' acompanha os jobs: ativos sem dados ou sem estratégia válida não geram job
+    # (mas têm as suas linhas, com o motivo em 'Erro')
+    from execucao import executar_em_paralelo  # carrega o backtrader: só quando a triagem roda
+    linhas = []
+    validas = {}
+    for ativo, df in precos.items():
+        if df.empty:
+            # Ativo sem pregões no período (código inexistente, cancelado): aparece no ranking com o erro
+            linhas.extend({'Ativo': ativo, 'Estratégia': nome, 'Erro': "sem dados"} for nome in estrategias)
+            continue
+        # Validação antes de disparar: uma estratégia sem pregões para o aquecimento
+        # derrubaria o job do ativo inteiro, inclusive as que rodariam sem problema
+        validas[ativo] = []
+        for nome, classe in estrategias.items():
+            problemas = validar(classe, df)
+            if problemas:
+                linhas.append({'Ativo': ativo, 'Estratégia': nome, 'Erro': '; '.join(problemas)})
+            else:
+                validas[ativo].append(nome)
+    ativos = [ativo for ativo, nomes in validas.items() if nomes]
+    jobs = [
+        {'ativos': [ativo], 'estrategias': [estrategias[nome] for nome in validas[ativo]], 'caixa': caixa,
+         'comissao': comissao, 'percentual': percentual, 'motor': 'vetorizado', 'somente_metricas': True, 'inicio': inicio}
+        for ativo in ativos
+    ]
+
+    concluidos = []
+    def registrar(i, resultado):
+        concluidos.append(i)
+        if ao_concluir:
+            ao_concluir(len(concluidos), len(jobs))
+
+    for ativo, r in zip(ativos, executar_em_paralelo(precos, jobs, processos=processos, ao_concluir=registrar)):
+        if 'erro' in r:
+            linhas.extend({'Ativo': ativo, 'Estratégia': nome, 'Erro': r['erro']} for nome in validas[ativo])
+            continue
+        for nome, resultado in zip(validas[ativo], r['estrategias']):
+            linhas.append({
+                'Ativo': ativo,
+                'Estratégia': nome,
+                'Sharpe': resultado['sharpe'],
+                'Retorno (%)': (resultado['valor_final'] - caixa) / caixa * 100,
+                'Drawdown (%)': resultado['drawdown'],
+            })
+
+    df = pd.DataFrame(linhas, columns=['Ativo', 'Estratégia', 'Sharpe', 'Retorno (%)', 'Drawdown (%)', 'Erro'])
+    if df['Erro'].isna().all():
+        df = df.drop(columns='Erro')
+    return df.astype({'Sharpe': 'float64', 'Retorno (%)': 'float64', 'Drawdown (%)': 'float64'}).round(
+        {'Sharpe': 3, 'Retorno (%)': 2, 'Drawdown (%)': 2})
+
+
+def ordenar(df, metrica="Sharpe"):
+    return df.sort_values(metrica, ascending=ORDEM_RANKING[metrica], na_position='last').reset_index(drop=True)
+
+
+def estrategias_rapidas(estrategias):
+    # Só as que têm regra vetorizada: a varredura completa fica em segundos
+    return {nome: classe for nome, classe in estrategias.items() if suporta_vetorizado(classe)}
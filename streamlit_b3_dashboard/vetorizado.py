@@ -0,0 +1,393 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from cache_indicadores import CACHE_INDICADORES
+from nucleos import stop_alvo
+
+# -------------------------
+# ⚡ Motor de backtest vetorizado (NumPy)
+# -------------------------
+# Reproduz as estratégias "compra quando X, zera quando Y" sem passar pelo loop
+# next() do Cerebro: os indicadores são calculados sobre a série inteira, o
+# estado comprado/zerado sai de operações acumuladas sobre os sinais e o
+# patrimônio é montado trade a trade. As convenções seguem o backtrader:
+#   - o sinal do fechamento do pregão t é executado na abertura de t+1;
+#   - a estratégia só opera a partir do período mínimo (aquecimento) dela;
+#   - Sharpe = SharpeRatio padrão (retornos anuais, taxa livre de 1%, desvio populacional);
+#   - Drawdown = maior queda percentual do patrimônio em relação ao pico.
+
+# -------------------------
+# Indicadores (mesmas fórmulas e aquecimento do backtrader)
+# -------------------------
+
+def sma(x, periodo):
+    return pd.Series(x).rolling(periodo).mean().to_numpy()
+
+
+def _media_exponencial(x, alpha, periodo):
+    # Semente = média simples dos primeiros 'periodo' valores válidos, como no backtrader
+    x = np.asarray(x, dtype='float64')
+    saida = np.full(len(x), np.nan)
+    validos = np.flatnonzero(~np.isnan(x))
+    if len(validos) < periodo:
+        return saida
+    semente = validos[0] + periodo - 1
+    serie = x.copy()
+    serie[:semente] = np.nan
+    serie[semente] = x[validos[0]:semente + 1].mean()
+    saida[semente:] = pd.Series(serie[semente:]).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    return saida
+
+
+def ema(x, periodo):
+    return _media_exponencial(x, 2.0 / (periodo + 1), periodo)
+
+
+def smma(x, periodo):
+    return _media_exponencial(x, 1.0 / periodo, periodo)
+
+
+def desvio_padrao(x, periodo):
+    return pd.Series(x).rolling(periodo).std(ddof=0).to_numpy()
+
+
+def maximo(x, periodo):
+    return pd.Series(x).rolling(periodo).max().to_numpy()
+
+
+def minimo(x, periodo):
+    return pd.Series(x).rolling(periodo).min().to_numpy()
+
+
+def deslocar(x, n):
+    # n > 0 atrasa a série (valor de n pregões atrás), como linha(-n) no backtrader
+    saida = np.full(len(x), np.nan)
+    if n >= 0:
+        saida[n:] = x[:len(x) - n]
+    else:
+        saida[:n] = x[-n:]
+    return saida
+
+
+def cruzamento(a, b):
+    # +1 quando a cruza b para cima, -1 para baixo. Como o CrossOver do backtrader,
+    # compara com a última diferença não nula (empates não contam como cruzamento)
+    dif = a - b
+    nao_nula = pd.Series(np.where(dif == 0, np.nan, dif)).ffill().to_numpy()
+    anterior = deslocar(nao_nula, 1)
+    saida = np.where((anterior < 0) & (dif > 0), 1.0, np.where((anterior > 0) & (dif < 0), -1.0, 0.0))
+    saida[np.isnan(anterior) | np.isnan(dif)] = np.nan
+    return saida
+
+
+def rsi(fechamento, periodo=14):
+    variacao = np.diff(fechamento, prepend=np.nan)
+    alta = smma(np.where(np.isnan(variacao), np.nan, np.maximum(variacao, 0.0)), periodo)
+    baixa = smma(np.where(np.isnan(variacao), np.nan, np.maximum(-variacao, 0.0)), periodo)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100.0 - 100.0 / (1.0 + alta / baixa)
+
+
+def macd(fechamento, rapida=12, lenta=26, sinal=9):
+    linha = ema(fechamento, rapida) - ema(fechamento, lenta)
+    return linha, ema(linha, sinal)
+
+
+def bandas_bollinger(fechamento, periodo=20, desvios=2.0):
+    media = sma(fechamento, periodo)
+    dp = desvio_padrao(fechamento, periodo)
+    return media + desvios * dp, media, media - desvios * dp
+
+
+def adx(maxima, minima, fechamento, periodo=14):
+    sobe = maxima - deslocar(maxima, 1)
+    desce = deslocar(minima, 1) - minima
+    dm_mais = np.where((sobe > desce) & (sobe > 0), sobe, 0.0)
+    dm_menos = np.where((desce > sobe) & (desce > 0), desce, 0.0)
+    dm_mais[0] = dm_menos[0] = np.nan
+
+    fechamento_anterior = deslocar(fechamento, 1)
+    amplitude = np.fmax(maxima, fechamento_anterior) - np.fmin(minima, fechamento_anterior)
+    amplitude[0] = np.nan
+    atr = smma(amplitude, periodo)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        di_mais = 100.0 * smma(dm_mais, periodo) / atr
+        di_menos = 100.0 * smma(dm_menos, periodo) / atr
+        dx = np.abs(di_mais - di_menos) / (di_mais + di_menos)
+    return 100.0 * smma(dx, periodo)
+
+
+def estocastico_lento(maxima, minima, fechamento, periodo=14, rapida=3, lenta=3):
+    topo = maximo(maxima, periodo)
+    fundo = minimo(minima, periodo)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = 100.0 * (fechamento - fundo) / (topo - fundo)
+    perc_k = sma(k, rapida)
+    return perc_k, sma(perc_k, lenta)
+
+
+def ichimoku(maxima, minima, tenkan=9, kijun=26, senkou=52, deslocamento=26):
+    tenkan_sen = (maximo(maxima, tenkan) + minimo(minima, tenkan)) / 2.0
+    kijun_sen = (maximo(maxima, kijun) + minimo(minima, kijun)) / 2.0
+    span_a = deslocar((tenkan_sen + kijun_sen) / 2.0, deslocamento)
+    span_b = deslocar((maximo(maxima, senkou) + minimo(minima, senkou)) / 2.0, deslocamento)
+    return span_a, span_b
+
+
+def momentum(fechamento, periodo=10):
+    return fechamento - deslocar(fechamento, periodo)
+
+
+def taxa_variacao(fechamento, periodo=12):
+    # ROC do backtrader: variação relativa a 'periodo' pregões atrás
+    anterior = deslocar(fechamento, periodo)
+    return (fechamento - anterior) / anterior
+
+
+def volatilidade_retornos(fechamento, periodo=20, variacao=30):
+    # StandardDeviation(PercentChange(close)) do backtrader; o PercentChange de
+    # lá mede, por padrão, a variação sobre 30 pregões
+    return desvio_padrao(fechamento / deslocar(fechamento, variacao) - 1.0, periodo)
+
+
+# -------------------------
+# Regras de entrada/saída das estratégias
+# -------------------------
+# Cada regra recebe as colunas do pregão e devolve (entrada, saída, linhas), em
+# que 'linhas' são todas as linhas de indicador que a estratégia do backtrader
+# cria; o aquecimento é o primeiro pregão em que todas estão prontas. Os
+# indicadores passam por _calc, que os reaproveita do cache compartilhado.
+# Nas regras que dependem do caminho (stop, alvo), a saída é uma função
+# estado(entrada) que roda um núcleo compilado (nucleos.py) pregão a pregão.
+
+def _calc(p, funcao, *args):
+    # Argumentos em texto são nomes de colunas; os demais, parâmetros do indicador
+    calcular = lambda: funcao(*[p[a] if isinstance(a, str) else a for a in args])
+    if p.get('chave') is None:
+        return calcular()
+    return CACHE_INDICADORES.obter((p['chave'], funcao.__name__, args), calcular)
+
+
+def _regra_stochastic(p, **_):
+    perc_k, perc_d = _calc(p, estocastico_lento, 'High', 'Low', 'Close')
+    return perc_k < 20, perc_k > 80, [perc_k, perc_d]
+
+
+def _regra_sma_cross(p, fast=10, slow=30, **_):
+    cruz = cruzamento(_calc(p, sma, 'Close', fast), _calc(p, sma, 'Close', slow))
+    return cruz > 0, cruz < 0, [cruz]
+
+
+def _regra_ema_cross(p, **_):
+    cruz = cruzamento(_calc(p, ema, 'Close', 12), _calc(p, ema, 'Close', 26))
+    return cruz > 0, cruz < 0, [cruz]
+
+
+def _regra_bollinger(p, **_):
+    topo, media, fundo = _calc(p, bandas_bollinger, 'Close')
+    return p['Close'] < fundo, p['Close'] > topo, [topo, media, fundo]
+
+
+def _regra_rsi(p, **_):
+    r = _calc(p, rsi, 'Close', 14)
+    return r < 30, r > 70, [r]
+
+
+def _regra_macd(p, **_):
+    linha, sinal = _calc(p, macd, 'Close')
+    return linha > sinal, linha < sinal, [linha, sinal]
+
+
+def _regra_adx(p, **_):
+    a = _calc(p, adx, 'High', 'Low', 'Close')
+    return a > 25, a < 20, [a]
+
+
+def _regra_momentum(p, **_):
+    m = _calc(p, momentum, 'Close', 10)
+    return m > 0, m < 0, [m]
+
+
+def _regra_ichimoku(p, **_):
+    span_a, span_b = _calc(p, ichimoku, 'High', 'Low')
+    return p['Close'] > span_a, p['Close'] < span_b, [span_a, span_b]
+
+
+def _regra_marsi(p, **_):
+    media = _calc(p, sma, 'Close', 14)
+    r = _calc(p, rsi, 'Close', 14)
+    return (p['Close'] > media) & (r < 30), r > 70, [media, r]
+
+
+def _regra_media_volatilidade(p, fast=10, slow=30, vol_window=20, vol_threshold=0.02, **_):
+    rapida = _calc(p, sma, 'Close', fast)
+    lenta = _calc(p, sma, 'Close', slow)
+    vol = _calc(p, volatilidade_retornos, 'Close', vol_window)
+    return (rapida > lenta) & (vol > vol_threshold), rapida < lenta, [rapida, lenta, vol]
+
+
+def _regra_momentum_trailing(p, momentum_period=15, stop_loss=0.05, take_profit=0.10, **_):
+    m = _calc(p, taxa_variacao, 'Close', momentum_period)
+    fechamento = p['Close']
+    return m > 0, lambda entrada: stop_alvo(entrada, fechamento, stop_loss, take_profit), [m]
+
+
+REGRAS = {
+    "StrategyStochasticSlow": _regra_stochastic,
+    "StrategySMACross": _regra_sma_cross,
+    "StrategyEMACross": _regra_ema_cross,
+    "StrategyBollinger": _regra_bollinger,
+    "StrategyRSI": _regra_rsi,
+    "StrategyMACD": _regra_macd,
+    "StrategyADX": _regra_adx,
+    "StrategyMomentum": _regra_momentum,
+    "StrategyIchimoku": _regra_ichimoku,
+    "StrategyMARSI": _regra_marsi,
+    "StrategyMovingAverageVolatility": _regra_media_volatilidade,
+    "StrategyMomentumTrailing": _regra_momentum_trailing,
+}
+
+
+def suporta(nome_estrategia):
+    return nome_estrategia in REGRAS
+
+
+# -------------------------
+# Simulação
+# -------------------------
+
+def estado_posicao(entrada, saida):
+    # Estado após o sinal de cada pregão para "if not position and entrada: buy /
+    # elif position and saida: close". Pregões só com entrada ligam, só com saída
+    # desligam, sem sinal mantêm; com ambos, invertem o estado anterior.
+    n = len(entrada)
+    decidido = entrada ^ saida
+    ambos = (entrada & saida).astype(np.int64)
+
+    posicoes = np.arange(n)
+    ultimo_decidido = np.maximum.accumulate(np.where(decidido, posicoes, -1))
+    tem_decisao = ultimo_decidido >= 0
+    ref = np.where(tem_decisao, ultimo_decidido, 0)
+
+    acumulado = np.cumsum(ambos)
+    inversoes = acumulado - np.where(tem_decisao, acumulado[ref], 0)
+    base = np.where(tem_decisao, entrada[ref], False).astype(np.int64)
+    return (base ^ (inversoes & 1)).astype(bool)
+
+
+def _trades(estado):
+    # Pregões de execução (abertura) das compras e das vendas
+    comprado = np.concatenate(([False], estado[:-1]))
+    mudanca = np.diff(comprado.astype(np.int8), prepend=0)
+    return comprado, np.flatnonzero(mudanca == 1), np.flatnonzero(mudanca == -1)
+
+
+def simular(abertura, fechamento, entrada, saida, caixa=10000.0, comissao=0.0, percentual=None, lote=1):
+    # percentual=None usa lote fixo (sizer padrão do Cerebro); percentual=95
+    # equivale a bt.sizers.PercentSizer(percents=95). 'saida' pode ser a função
+    # estado(entrada) de uma regra que depende do caminho.
+    while True:
+        estado = saida(entrada) if callable(saida) else estado_posicao(entrada, saida)
+        comprado, compras, vendas = _trades(estado)
+        preco_compra = abertura[compras]
+        preco_venda = abertura[vendas]
+        preco_venda = np.concatenate((preco_venda, np.full(len(compras) - len(vendas), np.nan)))
+
+        if percentual is not None:
+            # Fração do caixa comprometida em cada compra; o patrimônio evolui de forma multiplicativa
+            fracao = percentual / 100.0 * preco_compra / fechamento[compras - 1]
+            fator = 1.0 - fracao * (1.0 + comissao) + fracao * preco_venda / preco_compra * (1.0 - comissao)
+            caixa_trade = caixa * np.concatenate(([1.0], np.cumprod(fator)))
+            tamanho = percentual / 100.0 * caixa_trade[:-1] / fechamento[compras - 1]
+        else:
+            tamanho = np.full(len(compras), float(lote))
+            lucro = tamanho * (preco_venda * (1.0 - comissao) - preco_compra * (1.0 + comissao))
+            caixa_trade = caixa + np.concatenate(([0.0], np.cumsum(lucro)))
+
+        # Ordens sem caixa suficiente são rejeitadas pela corretora, tanto no envio
+        # (ao preço do fechamento do sinal) quanto na execução (na abertura):
+        # descarta o sinal que as gerou e recalcula (a próxima entrada válida assume)
+        preco_max = np.maximum(preco_compra, fechamento[compras - 1])
+        rejeitadas = tamanho * preco_max * (1.0 + comissao) > caixa_trade[:-1]
+        if not rejeitadas.any():
+            break
+        if percentual is None:
+            # Com lote fixo a rejeição depende do caixa, que muda quando um trade some
+            rejeitadas = np.arange(len(compras)) == np.argmax(rejeitadas)
+        entrada = entrada.copy()
+        entrada[compras[rejeitadas] - 1] = False
+
+    n = len(estado)
+    n_compras = np.cumsum(np.bincount(compras, minlength=n))
+    n_vendas = np.cumsum(np.bincount(vendas, minlength=n))
+
+    # Zerado, o patrimônio é o caixa após a última venda; comprado, é o caixa que
+    # sobrou da compra mais a posição marcada no fechamento
+    zerado = caixa_trade[n_vendas]
+    if len(compras):
+        trade = np.maximum(n_compras - 1, 0)
+        sobra = caixa_trade[trade] - tamanho[trade] * preco_compra[trade] * (1.0 + comissao)
+        em_posicao = sobra + tamanho[trade] * fechamento
+    else:
+        em_posicao = zerado
+
+    equity = np.where(comprado, em_posicao, zerado)
+    return equity, compras, vendas
+
+
+def sharpe_anual(datas, equity, caixa, taxa_livre=0.01):
+    # SharpeRatio padrão do backtrader: retorno de cada ano-calendário (o
+    # primeiro contra o caixa inicial), menos a taxa livre, sobre o desvio populacional
+    fim_de_ano = pd.Series(equity, index=datas).groupby(pd.DatetimeIndex(datas).year).last().to_numpy()
+    retornos = fim_de_ano / np.concatenate(([caixa], fim_de_ano[:-1])) - 1.0
+    excesso = retornos - taxa_livre
+    if len(excesso) == 0:
+        return None
+    # Médias com math.fsum, como no backtrader: anos sem operação dão desvio
+    # exatamente zero (Sharpe indefinido), e não um resíduo de arredondamento
+    media = math.fsum(excesso) / len(excesso)
+    desvio = math.sqrt(math.fsum((excesso - media) ** 2) / len(excesso))
+    if desvio == 0 or np.isnan(desvio):
+        return None
+    return float(media / desvio)
+
+
+def drawdown_maximo(equity):
+    pico = np.maximum.accumulate(equity)
+    return float(np.max(100.0 * (pico - equity) / pico)) if len(equity) else 0.0
+
+
+def executar_vetorizado(df, nome_estrategia, params=None, caixa=10000.0, comissao=0.0, percentual=None, ticker=None,
+                        inicio=None):
+    p = {col: df[col].to_numpy(dtype='float64') for col in ['Open', 'High', 'Low', 'Close']}
+    # Sem ticker não há como identificar a série, e os indicadores não vão para o cache.
+    # A soma dos fechamentos entra na chave porque a atualização do cache pode
+    # regravar o último pregão sem mudar as datas
+    p['chave'] = (ticker, str(df.index[0]), str(df.index[-1]), len(df), float(p['Close'].sum())) if ticker and len(df) else None
+    entrada, saida, linhas = REGRAS[nome_estrategia](p, **(params or {}))
+
+    # Antes do aquecimento o Cerebro chama prenext() e a estratégia não opera
+    aquecimento = max((int(np.argmax(~np.isnan(linha))) if (~np.isnan(linha)).any() else len(df)) for linha in linhas)
+    operando = np.arange(len(df)) >= aquecimento
+    if inicio is not None:
+        # Pregões anteriores a 'inicio' só aquecem os indicadores (ver execucao.py)
+        operando &= df.index >= pd.Timestamp(inicio)
+    entrada = np.asarray(entrada & operando, dtype=bool)
+    if not callable(saida):
+        saida = np.asarray(saida & operando, dtype=bool)
+
+    equity, compras, vendas = simular(p['Open'], p['Close'], entrada, saida, caixa=caixa, comissao=comissao, percentual=percentual)
+    # Operações encerradas: zerado antes da compra e depois da venda, o patrimônio é só o caixa
+    retornos = equity[vendas] / equity[compras[:len(vendas)] - 1] - 1.0
+    return {
+        'equity': equity,
+        'datas': df.index,
+        'sharpe': sharpe_anual(df.index, equity, caixa),
+        'drawdown': drawdown_maximo(equity),
+        'compras': df.index[compras],
+        'vendas': df.index[vendas],
+        'operacoes': pd.Series(retornos, index=df.index[vendas], dtype='float64'),
+    }
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+from otimizacao import montar_jobs, ranking
+
+# -------------------------
+# 🚶 Otimização walk-forward
+# -------------------------
+# Divide o período em janelas: os parâmetros são escolhidos na janela de treino
+# (in-sample) e aplicados, sem ajuste, na janela de teste seguinte
+# (out-of-sample). Na janela rolante o treino anda junto com o teste; na
+# ancorada ele sempre começa no início do período. As varreduras de todas as
+# janelas vão juntas para o pool (os jobs saem agrupados por ativo, e os
+# preços de cada ativo são os mesmos em todas as janelas, então os indicadores
+# calculados numa servem às outras); as curvas out-of-sample são emendadas
+# numa só.
+
+MODOS = {"Rolante": False, "Ancorada": True}
+
+
+def janelas(calendario, treino, teste, ancorada=False):
+    # [(inicio_treino, inicio_teste, fim_teste)] em datas do calendário; fim_teste
+    # é exclusivo (None na última janela, que vai até o fim dos dados)
+    calendario = pd.DatetimeIndex(calendario)
+    resultado = []
+    for posicao in range(treino, len(calendario), teste):
+        inicio_treino = calendario[0] if ancorada else calendario[posicao - treino]
+        fim_teste = calendario[posicao + teste] if posicao + teste < len(calendario) else None
+        resultado.append((inicio_treino, calendario[posicao], fim_teste))
+    return resultado
+
+
+def emendar(curvas, caixa):
+    # Cada trecho out-of-sample começa com o caixa inicial; na emenda, ele
+    # continua do valor em que o trecho anterior terminou
+    partes, base = [], caixa
+    for datas, equity in curvas:
+        serie = pd.Series(np.asarray(equity, dtype='float64') * base / caixa, index=datas)
+        partes.append(serie)
+        base = serie.iloc[-1]
+    return pd.concat(partes) if partes else pd.Series(dtype='float64')
+
+
+def walk_forward(precos, estrategia, combinacoes, ativos, treino, teste, ancorada=False, motor='vetorizado',
+                 processos=None, ao_concluir=None, metrica="Sharpe", inicio=None, caixa=100000.0):
+    # 'treino' e 'teste' em pregões; 'ao_concluir(concluidos, total)' acompanha as duas etapas.
+    # Devolve (tabela por janela, curvas out-of-sample emendadas por ativo)
+    from execucao import executar_em_paralelo  # carrega o backtrader: só quando a varredura roda
+    calendario = pd.DatetimeIndex(sorted(set().union(*(precos[ativo].index for ativo in ativos))))
+    if inicio is not None:
+        calendario = calendario[calendario >= pd.Timestamp(inicio)]
+    cortes = janelas(calendario, treino, teste, ancorada)
+    if not cortes:
+        return pd.DataFrame(), pd.DataFrame()
+
+    # 1) Varredura in-sample de todas as janelas de uma vez
+    jobs = []
+    for ativo in ativos:
+        for inicio_treino, inicio_teste, _ in cortes:
+            for job in montar_jobs(estrategia, combinacoes, [ativo], motor=motor, caixa=caixa):
+                jobs.append(dict(job, inicio=inicio_treino, fim=inicio_teste))
+
+    total = len(jobs) + len(cortes) * len(ativos)
+    concluidos = []
+    def registrar(i, resultado):
+        concluidos.append(i)
+        if ao_concluir:
+            ao_concluir(len(concluidos), total)
+
+    resultados = executar_em_paralelo(precos, jobs, processos=processos, ao_concluir=registrar)
+
+    # Ordem dos jobs: ativo, janela, combinação -> resultados[ativo][janela] na ordem de ranking()
+    n = len(combinacoes)
+    escolhas = []
+    for j in range(len(cortes)):
+        da_janela = [resultados[(a * len(cortes) + j) * n + c] for a in range(len(ativos)) for c in range(n)]
+        df = ranking(combinacoes, ativos, da_janela, metrica=metrica, caixa=caixa)
+        # df.loc por coluna mantém o tipo de cada parâmetro (a linha inteira viraria float)
+        escolhas.append(None if df.empty else {coluna: df.loc[0, coluna].item() for coluna in [*combinacoes[0], metrica]})
+
+    # 2) Teste out-of-sample com os parâmetros escolhidos em cada janela
+    jobs_teste, origem = [], []
+    for j, ((_, inicio_teste, fim_teste), melhor) in enumerate(zip(cortes, escolhas)):
+        if melhor is None:
+            continue
+        params = {p: melhor[p] for p in combinacoes[0]}
+        for job in montar_jobs(estrategia, [params], ativos, motor=motor, caixa=caixa):
+            job.update(inicio=inicio_teste, fim=fim_teste, somente_metricas=False)
+            jobs_teste.append(job)
+            origem.append((j, job['ativos'][0], params))
+    testes = executar_em_paralelo(precos, jobs_teste, processos=processos,
+                                  ao_concluir=lambda i, r: registrar(len(jobs) + i, r))
+
+    linhas, curvas = [], {ativo: [] for ativo in ativos}
+    for (j, ativo, params), r in zip(origem, testes):
+        inicio_treino, inicio_teste, fim_teste = cortes[j]
+        linha = {
+            'Janela': j + 1,
+            'Ativo': ativo,
+            'Treino': f"{inicio_treino.date()} a {inicio_teste.date()}",
+            'Teste': f"{inicio_teste.date()} a {fim_teste.date() if fim_teste is not None else calendario[-1].date()}",
+            **params,
+            f'{metrica} (treino)': escolhas[j][metrica],
+        }
+        if 'erro' in r:
+            linha['Erro'] = r['erro']
+        else:
+            linha['Retorno teste (%)'] = round((r['valor_final'] - caixa) / caixa * 100, 2)
+            linha['Drawdown teste (%)'] = round(r['drawdown'], 2)
+            curvas[ativo].append((r['datas'], r['equity']))
+        linhas.append(linha)
+
+    curva = pd.DataFrame({ativo: emendar(partes, caixa) for ativo, partes in curvas.items() if partes})
+    return pd.DataFrame(linhas), curva